@@ -1,6 +1,7 @@
 import asyncio
 import hashlib
 import os
+import time
 import warnings
 from typing import AsyncGenerator, Dict, List
 
@@ -11,6 +12,7 @@ from google.adk.models.llm_request import LlmRequest
 from google.adk.models.llm_response import LlmResponse
 from google.genai import types
 from dotenv import load_dotenv
+from opentelemetry import metrics, trace
 
 from .prompts import CACHING_AGENT_INSTRUCTIONS
 
@@ -24,6 +26,14 @@ client = genai.Client(
 
 llm_cache: Dict[str, LlmResponse] = {}
 
+# --- Telemetry ---
+# Instruments come from the OpenTelemetry API and do nothing until a harness
+# installs a provider (see telemetry.py); the other examples follow the same pattern.
+tracer = trace.get_tracer(__name__)
+stage_duration = metrics.get_meter(__name__).create_histogram(
+    "adk.llm.stage.duration", unit="ms", description="Latency of each stage of a model call."
+)
+
 def get_request_hash(request: LlmRequest) -> str:
     """Creates a stable hash of the last user message in the request."""
     # Find the last message from the user to use as the cache key
@@ -40,12 +50,38 @@ class CachingLlm(BaseLlm):
     async def generate_content_async(
         self, request: LlmRequest, stream: bool = False
     ) -> AsyncGenerator[LlmResponse, None]:
-        cache_key = get_request_hash(request)
+        with tracer.start_as_current_span("CachingLlm.generate_content") as span:
+            span.set_attribute("llm.model", self.model)
+            llm_response = await self._generate(request, span)
+        # Yield outside the span so it is not left open while the caller holds the
+        # generator; the routing and retry wrappers are structured the same way
+        yield llm_response
 
-        if cache_key in llm_cache:
+    async def _generate(self, request: LlmRequest, span: trace.Span) -> LlmResponse:
+        started = time.perf_counter()
+        with tracer.start_as_current_span("cache.lookup") as lookup_span:
+            cache_key = get_request_hash(request)
+            cached_response = llm_cache.get(cache_key)
+            cache_hit = cached_response is not None
+            lookup_span.set_attribute("cache.hit", cache_hit)
+        span.set_attribute("cache.hit", cache_hit)
+        stage_duration.record(
+            (time.perf_counter() - started) * 1000, {"stage": "cache_lookup", "cache.hit": cache_hit}
+        )
+
+        if cache_hit:
             print("\n✅ Cache HIT. Returning stored response.")
-            yield llm_cache[cache_key]
-            return
+            # No tokens are spent on a hit; report what the original call cost instead
+            saved_usage = cached_response.usage_metadata
+            return cached_response.model_copy(update={
+                "usage_metadata": None,
+                "custom_metadata": {"usage_ledger": {
+                    "model": self.model,
+                    "cache_hit": True,
+                    "saved_model": self.model,
+                    "saved_usage": saved_usage.model_dump(exclude_none=True) if saved_usage else None,
+                }},
+            })
 
         print(f"\n❌ Cache MISS. Calling the underlying model: {self.model}")
         
@@ -54,18 +90,25 @@ class CachingLlm(BaseLlm):
             parts = [types.Part(text=part.text) for part in content.parts]
             contents.append(types.Content(parts=parts, role=content.role))
 
-        response = await client.aio.models.generate_content(
-            model=self.model,
-            contents=contents,
-            config=request.config
+        started = time.perf_counter()
+        with tracer.start_as_current_span("llm.upstream") as upstream_span:
+            upstream_span.set_attribute("llm.model", self.model)
+            response = await client.aio.models.generate_content(
+                model=self.model,
+                contents=contents,
+                config=request.config
+            )
+        stage_duration.record((time.perf_counter() - started) * 1000, {"stage": "upstream", "llm.model": self.model})
+        llm_response = LlmResponse(
+            content=response.candidates[0].content,
+            usage_metadata=response.usage_metadata,
+            custom_metadata={"usage_ledger": {"model": self.model, "cache_hit": False}},
         )
-        llm_response = LlmResponse(content=response.candidates[0].content)
 
         llm_cache[cache_key] = llm_response
         print("📝 Response cached for future use.")
 
-        yield llm_response
-
+        return llm_response
 
 root_agent = Agent(
     name="caching_agent",
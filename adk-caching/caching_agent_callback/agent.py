@@ -1,6 +1,7 @@
 import asyncio
 import json
 import time
+from collections import OrderedDict
 from typing import Any, Dict, Optional
 
 from google.adk.agents import Agent
@@ -12,6 +13,18 @@ from google.adk.sessions import InMemorySessionService, Session
 from google.adk.tools.base_tool import BaseTool
 from google.adk.tools.tool_context import ToolContext
 from google.genai.types import Content, Part
+from opentelemetry import metrics, trace
+
+# --- Telemetry ---
+tracer = trace.get_tracer(__name__)
+stage_duration = metrics.get_meter(__name__).create_histogram(
+    "adk.tool.stage.duration", unit="ms", description="Latency of the tool cache check and of tool execution."
+)
+# Start times of tool calls that missed the cache, keyed by function call id.
+# A tool that raises never reaches the after-tool callback, so the oldest
+# entries are dropped once the limit is reached.
+MAX_TRACKED_TOOL_CALLS = 1024
+_tool_started_at: "OrderedDict[str, float]" = OrderedDict()
 
 
 def get_stock_price(symbol: str) -> dict:
@@ -42,14 +55,26 @@ def before_tool_cache_check(
     tool: BaseTool, args: Dict[str, Any], tool_context: ToolContext
 ) -> Optional[Dict]:
     """Checks the cache before a tool runs."""
-    cache_key = create_cache_key(tool.name, args)
+    started = time.perf_counter()
+    with tracer.start_as_current_span("tool_cache.check") as span:
+        span.set_attribute("tool.name", tool.name)
+        cache_key = create_cache_key(tool.name, args)
+        cache_hit = cache_key in tool_context.state
+        span.set_attribute("cache.hit", cache_hit)
+    stage_duration.record(
+        (time.perf_counter() - started) * 1000,
+        {"stage": "cache_check", "tool.name": tool.name, "cache.hit": cache_hit},
+    )
     
-    if cache_key in tool_context.state:
+    if cache_hit:
         print(f"--- [CACHE HIT] Found result for '{tool.name}' in cache. Skipping tool execution.")
         cached_result = tool_context.state[cache_key]
         return cached_result 
     
     print(f"--- [CACHE MISS] No result for '{tool.name}' and '{args}' in cache. Executing tool.")
+    _tool_started_at[tool_context.function_call_id] = time.perf_counter()
+    while len(_tool_started_at) > MAX_TRACKED_TOOL_CALLS:
+        _tool_started_at.popitem(last=False)
     return None
 
 
@@ -57,9 +82,18 @@ def after_tool_cache_populate(
     tool: BaseTool, args: Dict[str, Any], tool_context: ToolContext, tool_response: Dict
 ) -> Optional[Dict]:
     """Populates the cache after a tool runs."""
-    cache_key = create_cache_key(tool.name, args)
-    
-    tool_context.state[cache_key] = tool_response
+    with tracer.start_as_current_span("tool_cache.populate") as span:
+        span.set_attribute("tool.name", tool.name)
+        # Only calls that missed the cache have a start time; hits never ran the tool
+        tool_started = _tool_started_at.pop(tool_context.function_call_id, None)
+        if tool_started is not None:
+            tool_duration_ms = (time.perf_counter() - tool_started) * 1000
+            span.set_attribute("tool.duration_ms", tool_duration_ms)
+            stage_duration.record(tool_duration_ms, {"stage": "tool_execution", "tool.name": tool.name})
+
+        cache_key = create_cache_key(tool.name, args)
+        
+        tool_context.state[cache_key] = tool_response
     print(f"--- [CACHE POPULATE] Stored result for '{tool.name}' and '{args}' in cache.")
     
     return None
@@ -1,5 +1,6 @@
 import asyncio
 import os
+import time
 import warnings
 from typing import AsyncGenerator, List
 
@@ -10,6 +11,7 @@ from google.adk.models.llm_request import LlmRequest
 from google.adk.models.llm_response import LlmResponse
 from google.genai import types
 from dotenv import load_dotenv
+from opentelemetry import metrics, trace
 
 from .prompts import ROUTING_AGENT_INSTRUCTIONS
 
@@ -21,6 +23,12 @@ client = genai.Client(
     vertexai=True, project=os.getenv('GOOGLE_CLOUD_PROJECT'), location=os.getenv('GOOGLE_CLOUD_LOCATION')
 )
 
+# --- Telemetry ---
+tracer = trace.get_tracer(__name__)
+stage_duration = metrics.get_meter(__name__).create_histogram(
+    "adk.llm.stage.duration", unit="ms", description="Latency of each stage of a model call."
+)
+
 class RoutingLlm(BaseLlm):
     """A BaseLlm that dynamically routes requests to different Gemini 2.5 models."""
 
@@ -28,39 +36,57 @@ class RoutingLlm(BaseLlm):
         self, request: LlmRequest, stream: bool = False
     ) -> AsyncGenerator[LlmResponse, None]:
         """Inspects the request and routes it to the appropriate model."""
-        
-        contents: List[types.Content] = []
-        for content in request.contents:
-            parts = [types.Part(text=part.text) for part in content.parts]
-            contents.append(types.Content(parts=parts, role=content.role))
+        with tracer.start_as_current_span("RoutingLlm.generate_content") as span:
+            llm_response = await self._generate(request, span)
+        yield llm_response
 
-        current_user_message = ""
-        for content in reversed(contents):
-            if content.role == "user":
-                current_user_message = " ".join([part.text for part in content.parts if part.text])
-                break
-        
-        if not current_user_message and contents:
-            last_content = contents[-1]
-            current_user_message = " ".join([part.text for part in last_content.parts if part.text])
+    async def _generate(self, request: LlmRequest, span: trace.Span) -> LlmResponse:
+        started = time.perf_counter()
+        with tracer.start_as_current_span("routing.decide") as routing_span:
+            contents: List[types.Content] = []
+            for content in request.contents:
+                parts = [types.Part(text=part.text) for part in content.parts]
+                contents.append(types.Content(parts=parts, role=content.role))
 
-        print(f"Current user message: {current_user_message}")
+            current_user_message = ""
+            for content in reversed(contents):
+                if content.role == "user":
+                    current_user_message = " ".join([part.text for part in content.parts if part.text])
+                    break
+            
+            if not current_user_message and contents:
+                last_content = contents[-1]
+                current_user_message = " ".join([part.text for part in last_content.parts if part.text])
 
-        if len(current_user_message) > 50:
-            model_to_use = "gemini-2.5-pro"
-            print(f"\nRouting to POWERFUL model: {model_to_use}")
-        else:
-            model_to_use = "gemini-2.5-flash"
-            print(f"\nRouting to FAST model: {model_to_use}")
+            print(f"Current user message: {current_user_message}")
 
-        response = await client.aio.models.generate_content(
-            model=model_to_use,
-            contents=contents,
-            config=request.config
-        )
-        
-        yield LlmResponse(content=response.candidates[0].content)
+            if len(current_user_message) > 50:
+                model_to_use = "gemini-2.5-pro"
+                print(f"\nRouting to POWERFUL model: {model_to_use}")
+            else:
+                model_to_use = "gemini-2.5-flash"
+                print(f"\nRouting to FAST model: {model_to_use}")
+            routing_span.set_attribute("routing.message_length", len(current_user_message))
+            routing_span.set_attribute("routing.model", model_to_use)
+        span.set_attribute("routing.model", model_to_use)
+        stage_duration.record((time.perf_counter() - started) * 1000, {"stage": "routing", "routing.model": model_to_use})
 
+        started = time.perf_counter()
+        with tracer.start_as_current_span("llm.upstream") as upstream_span:
+            upstream_span.set_attribute("llm.model", model_to_use)
+            response = await client.aio.models.generate_content(
+                model=model_to_use,
+                contents=contents,
+                config=request.config
+            )
+        stage_duration.record((time.perf_counter() - started) * 1000, {"stage": "upstream", "llm.model": model_to_use})
+        
+        return LlmResponse(
+            content=response.candidates[0].content,
+            usage_metadata=response.usage_metadata,
+            # Without routing every request would go to the powerful model
+            custom_metadata={"usage_ledger": {"model": model_to_use, "baseline_model": "gemini-2.5-pro"}},
+        )
 
 root_agent = Agent(
     name="routing_agent",
@@ -0,0 +1,51 @@
+import atexit
+import os
+import sys
+
+from opentelemetry import metrics, trace
+from opentelemetry.sdk.metrics import Histogram, MeterProvider
+from opentelemetry.sdk.metrics.export import ConsoleMetricExporter, PeriodicExportingMetricReader
+from opentelemetry.sdk.metrics.view import ExplicitBucketHistogramAggregation, View
+from opentelemetry.sdk.resources import Resource
+from opentelemetry.sdk.trace import TracerProvider
+from opentelemetry.sdk.trace.export import BatchSpanProcessor, ConsoleSpanExporter
+
+# Set to "console" to print spans and histograms, or to a file path to append
+# them as JSON lines. Unset leaves OpenTelemetry as a no-op.
+TELEMETRY_OUTPUT_ENV = "ADK_TELEMETRY_OUTPUT"
+# Histogram buckets in milliseconds, from cache lookups up to slow model calls
+LATENCY_BUCKETS_MS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000)
+METRIC_EXPORT_INTERVAL_MS = 60000
+
+
+def configure_telemetry(service_name: str) -> None:
+    """Installs local span and latency-histogram exporters; no collector is needed."""
+    output = os.getenv(TELEMETRY_OUTPUT_ENV)
+    if not output:
+        return
+
+    out = sys.stdout if output == "console" else open(output, "a", encoding="utf-8")
+    resource = Resource.create({"service.name": service_name})
+
+    tracer_provider = TracerProvider(resource=resource)
+    tracer_provider.add_span_processor(BatchSpanProcessor(
+        ConsoleSpanExporter(out=out, formatter=lambda span: span.to_json(indent=None) + "\n")
+    ))
+    trace.set_tracer_provider(tracer_provider)
+
+    meter_provider = MeterProvider(
+        resource=resource,
+        metric_readers=[PeriodicExportingMetricReader(
+            ConsoleMetricExporter(out=out, formatter=lambda data: data.to_json(indent=None) + "\n"),
+            export_interval_millis=METRIC_EXPORT_INTERVAL_MS,
+        )],
+        views=[View(
+            instrument_type=Histogram,
+            aggregation=ExplicitBucketHistogramAggregation(boundaries=LATENCY_BUCKETS_MS),
+        )],
+    )
+    metrics.set_meter_provider(meter_provider)
+
+    # Flush the last spans and histograms when the script exits
+    atexit.register(meter_provider.shutdown)
+    atexit.register(tracer_provider.shutdown)
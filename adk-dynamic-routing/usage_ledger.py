@@ -0,0 +1,134 @@
+import json
+import os
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from google.adk.agents import BaseAgent, LlmAgent
+from google.adk.agents.callback_context import CallbackContext
+from google.adk.models.llm_request import LlmRequest
+from google.adk.models.llm_response import LlmResponse
+from google.genai import types
+
+# One JSON line per model call is appended to this file
+USAGE_LEDGER_ENV = "ADK_USAGE_LEDGER"
+DEFAULT_USAGE_LEDGER_PATH = "usage_ledger.jsonl"
+# USD per million tokens as (input, cached input, output). List prices at the
+# time of writing; adjust them to your contract. Unknown models cost nothing.
+MODEL_PRICING: Dict[str, Tuple[float, float, float]] = {
+    "gemini-2.0-flash": (0.10, 0.025, 0.40),
+    "gemini-2.5-flash": (0.30, 0.075, 2.50),
+    "gemini-2.5-pro": (1.25, 0.31, 10.00),
+}
+# Key under `LlmResponse.custom_metadata` where the model wrapper reports how a
+# call was served: model, cache_hit, saved_usage/saved_model (the call a cache
+# hit replayed), baseline_model (the model without routing), retry_attempts
+WRAPPER_METADATA_KEY = "usage_ledger"
+# Start times of calls that never completed (the model raised) are dropped after this long
+MAX_CALL_SECONDS = 600
+
+
+def token_counts(usage: Optional[types.GenerateContentResponseUsageMetadata]) -> Tuple[int, int, int]:
+    """Returns (prompt, cached, output) tokens; thinking tokens are billed as output."""
+    if usage is None:
+        return 0, 0, 0
+    output_tokens = (usage.candidates_token_count or 0) + (usage.thoughts_token_count or 0)
+    return usage.prompt_token_count or 0, usage.cached_content_token_count or 0, output_tokens
+
+
+def usage_cost(model: Optional[str], prompt_tokens: int, cached_tokens: int, output_tokens: int) -> float:
+    """Prices a call in USD; cached prompt tokens are billed at the cached-input rate."""
+    input_price, cached_price, output_price = MODEL_PRICING.get(model or "", (0.0, 0.0, 0.0))
+    return (
+        (prompt_tokens - cached_tokens) * input_price
+        + cached_tokens * cached_price
+        + output_tokens * output_price
+    ) / 1_000_000
+
+
+class UsageLedger:
+    """
+    Records tokens, latency, cost and the wrapper's cache/route/retry outcome of every model call.
+
+    `attach()` adds model callbacks to an agent and its sub-agents. Each call
+    becomes one JSON line in the ledger file, keyed by invocation id.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or os.getenv(USAGE_LEDGER_ENV) or DEFAULT_USAGE_LEDGER_PATH
+        self.records: List[Dict[str, Any]] = []
+        # (invocation_id, agent_name) -> (start time, requested model)
+        self._started: Dict[Tuple[str, str], Tuple[float, str]] = {}
+
+    def attach(self, agent: BaseAgent) -> None:
+        if isinstance(agent, LlmAgent):
+            # Start timing last and record first, so other callbacks that
+            # short-circuit or rewrite the response do not skew the ledger
+            agent.before_model_callback = agent.canonical_before_model_callbacks + [self.before_model]
+            agent.after_model_callback = [self.after_model] + agent.canonical_after_model_callbacks
+        for child in agent.sub_agents:
+            self.attach(child)
+
+    def before_model(self, callback_context: CallbackContext, llm_request: LlmRequest) -> None:
+        now = time.perf_counter()
+        for key in [key for key, (started_at, _) in self._started.items() if now - started_at > MAX_CALL_SECONDS]:
+            del self._started[key]
+        self._started[(callback_context.invocation_id, callback_context.agent_name)] = (now, llm_request.model or "")
+        return None
+
+    def after_model(self, callback_context: CallbackContext, llm_response: LlmResponse) -> None:
+        # Streamed chunks carry no usage; only the final response is billed
+        if llm_response.partial:
+            return None
+        started = self._started.pop((callback_context.invocation_id, callback_context.agent_name), None)
+        if started is None:
+            return None
+        started_at, requested_model = started
+
+        outcome = (llm_response.custom_metadata or {}).get(WRAPPER_METADATA_KEY, {})
+        model = outcome.get("model") or requested_model
+        prompt_tokens, cached_tokens, output_tokens = token_counts(llm_response.usage_metadata)
+        cost = usage_cost(model, prompt_tokens, cached_tokens, output_tokens)
+
+        cache_saved = 0.0
+        if outcome.get("cache_hit") and outcome.get("saved_usage"):
+            saved_usage = types.GenerateContentResponseUsageMetadata.model_validate(outcome["saved_usage"])
+            cache_saved = usage_cost(outcome.get("saved_model") or model, *token_counts(saved_usage))
+
+        baseline_model = outcome.get("baseline_model")
+        routing_saved = 0.0
+        if baseline_model and baseline_model != model:
+            routing_saved = usage_cost(baseline_model, prompt_tokens, cached_tokens, output_tokens) - cost
+
+        record = {
+            "invocation_id": callback_context.invocation_id,
+            "agent_name": callback_context.agent_name,
+            "model": model,
+            "prompt_tokens": prompt_tokens,
+            "cached_tokens": cached_tokens,
+            "output_tokens": output_tokens,
+            "latency_ms": round((time.perf_counter() - started_at) * 1000, 2),
+            "cost_usd": cost,
+            "cache_hit": bool(outcome.get("cache_hit")),
+            "cache_saved_usd": cache_saved,
+            "baseline_model": baseline_model,
+            "routing_saved_usd": routing_saved,
+            "retry_attempts": int(outcome.get("retry_attempts", 1)),
+            "timestamp": time.time(),
+        }
+        self.records.append(record)
+        with open(self.path, "a", encoding="utf-8") as ledger_file:
+            ledger_file.write(json.dumps(record) + "\n")
+        return None
+
+    def print_summary(self) -> None:
+        """Prints the totals of the calls recorded by this run."""
+        if not self.records:
+            return
+        tokens = sum(record["prompt_tokens"] + record["output_tokens"] for record in self.records)
+        print(f"\n--- Usage Ledger ({len(self.records)} model calls, appended to {self.path}) ---")
+        print(f"Tokens: {tokens}  Cost: ${sum(record['cost_usd'] for record in self.records):.6f}")
+        print(
+            f"Saved by caching: ${sum(record['cache_saved_usd'] for record in self.records):.6f}"
+            f" ({sum(record['cache_hit'] for record in self.records)} cache hit(s))"
+        )
+        print(f"Saved by routing: ${sum(record['routing_saved_usd'] for record in self.records):.6f}")
@@ -0,0 +1,59 @@
+"""
+A local HTTP data source for the feedback app's tools.
+
+Serves the same mock weather and stock data as the in-process fallback, with
+an optional artificial delay, so tool latency and event-loop blocking can be
+tested offline:
+
+    python -m agent_app.mock_data_server --port 8765 --latency 0.2
+    TOOL_BACKEND_URL=http://127.0.0.1:8765 python main.py
+"""
+import argparse
+import asyncio
+import threading
+import time
+
+import uvicorn
+from fastapi import FastAPI
+
+from .tools import MOCK_STOCK_DB, MOCK_WEATHER_DB
+
+
+def create_app(latency_seconds: float = 0.0) -> FastAPI:
+    """Builds the mock data API; every response is delayed by `latency_seconds`."""
+    app = FastAPI(title="Mock tool data source")
+
+    @app.get("/weather/{city}")
+    async def weather(city: str) -> dict:
+        await asyncio.sleep(latency_seconds)
+        return {"city": city, "weather_report": MOCK_WEATHER_DB.get(city.lower())}
+
+    @app.get("/stock/{ticker}")
+    async def stock(ticker: str) -> dict:
+        await asyncio.sleep(latency_seconds)
+        return {"ticker": ticker, "stock_price": MOCK_STOCK_DB.get(ticker.upper())}
+
+    return app
+
+
+def start_in_background(port: int = 8765, latency_seconds: float = 0.0) -> uvicorn.Server:
+    """Starts the mock server on a daemon thread and waits until it accepts connections."""
+    server = uvicorn.Server(uvicorn.Config(
+        create_app(latency_seconds), host="127.0.0.1", port=port, log_level="warning"
+    ))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.01)
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Runs the mock tool data source.")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.0, help="Artificial delay per request, in seconds.")
+    args = parser.parse_args()
+    uvicorn.run(create_app(args.latency), host="127.0.0.1", port=args.port, log_level="info")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,177 @@
+import asyncio
+import functools
+import inspect
+import os
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+
+import httpx
+
+# --- Configuration ---
+# Base URL of the tool data source, e.g. the local mock server in
+# `mock_data_server.py`. When unset, tools answer from in-process mock data.
+BACKEND_URL_ENV = "TOOL_BACKEND_URL"
+HTTP_TIMEOUT_SECONDS = 10.0
+HTTP_MAX_CONNECTIONS = 20
+HTTP_MAX_KEEPALIVE_CONNECTIONS = 10
+# Threads for tool implementations that block (sync I/O, CPU work)
+TOOL_THREAD_POOL_SIZE = 8
+
+
+def backend_url() -> Optional[str]:
+    """Returns the configured tool data source URL, if any."""
+    return os.getenv(BACKEND_URL_ENV) or None
+
+
+# --- Shared Connection Pool ---
+_http_clients: Dict[Tuple[int, str], httpx.AsyncClient] = {}
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """
+    Returns the pooled HTTP client for the current event loop and backend URL.
+
+    All tools share one client, so connections to the data source are kept
+    alive and reused instead of being opened for every call.
+    """
+    base_url = backend_url()
+    if base_url is None:
+        raise RuntimeError(f"{BACKEND_URL_ENV} is not set.")
+
+    key = (id(asyncio.get_running_loop()), base_url)
+    client = _http_clients.get(key)
+    if client is None or client.is_closed:
+        client = httpx.AsyncClient(
+            base_url=base_url,
+            timeout=HTTP_TIMEOUT_SECONDS,
+            limits=httpx.Limits(
+                max_connections=HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=HTTP_MAX_KEEPALIVE_CONNECTIONS,
+            ),
+        )
+        _http_clients[key] = client
+    return client
+
+
+async def close_http_clients() -> None:
+    """Closes the pooled HTTP clients of the current event loop."""
+    loop_id = id(asyncio.get_running_loop())
+    for key in [key for key in _http_clients if key[0] == loop_id]:
+        await _http_clients.pop(key).aclose()
+
+
+# --- Blocking Offload ---
+_tool_executor = ThreadPoolExecutor(max_workers=TOOL_THREAD_POOL_SIZE, thread_name_prefix="tool-backend")
+
+
+async def run_blocking(func: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+    """Runs a blocking function on the tool thread pool without blocking the event loop."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_tool_executor, functools.partial(func, *args, **kwargs))
+
+
+# --- TTL Cache ---
+class TTLCache:
+    """A small LRU cache whose entries expire `ttl_seconds` after they were stored."""
+
+    def __init__(self, ttl_seconds: float, maxsize: int = 1024):
+        self.ttl_seconds = ttl_seconds
+        self.maxsize = maxsize
+        self._entries: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+
+    def get(self, key: Hashable) -> Tuple[bool, Any]:
+        """Returns (hit, value); expired entries count as misses."""
+        entry = self._entries.get(key)
+        if entry is None:
+            return False, None
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            return False, None
+        self._entries.move_to_end(key)
+        return True, value
+
+    def set(self, key: Hashable, value: Any) -> None:
+        self._entries[key] = (time.monotonic() + self.ttl_seconds, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+
+# --- Tool Decorator ---
+class _CallAbandoned(Exception):
+    """Set on a shared in-flight call whose first caller was cancelled; waiters retry."""
+
+
+def async_tool(ttl_seconds: float = 60.0, maxsize: int = 1024) -> Callable[[Callable[..., Any]], Callable[..., Awaitable[Any]]]:
+    """
+    Turns a tool implementation into a cached coroutine function for `FunctionTool`.
+
+    - Coroutine functions are awaited directly on the event loop.
+    - Plain (blocking) functions run on a shared thread pool, so they never
+      block the loop that serves every session.
+    - Results are cached per argument set for `ttl_seconds`, and concurrent
+      calls with the same arguments share one in-flight backend call. If the
+      caller that started it is cancelled, the next waiter starts it again.
+
+    The wrapper keeps the name, docstring and signature of the implementation,
+    which `FunctionTool` uses to build the declaration sent to the model.
+    """
+    def decorator(func: Callable[..., Any]) -> Callable[..., Awaitable[Any]]:
+        signature = inspect.signature(func)
+        cache = TTLCache(ttl_seconds, maxsize)
+        in_flight: Dict[Hashable, asyncio.Future] = {}
+
+        async def call_backend(arguments: Dict[str, Any]) -> Any:
+            if inspect.iscoroutinefunction(func):
+                return await func(**arguments)
+            return await run_blocking(func, **arguments)
+
+        @functools.wraps(func)
+        async def wrapper(*args: Any, **kwargs: Any) -> Any:
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            key = tuple(sorted(bound.arguments.items()))
+
+            while True:
+                hit, value = cache.get(key)
+                if hit:
+                    return value
+
+                pending = in_flight.get(key)
+                if pending is None:
+                    break
+                try:
+                    return await asyncio.shield(pending)
+                except _CallAbandoned:
+                    # Only the first caller was cancelled, not this one; try again
+                    continue
+
+            pending = asyncio.get_running_loop().create_future()
+            in_flight[key] = pending
+            try:
+                value = await call_backend(bound.arguments)
+            except asyncio.CancelledError:
+                pending.set_exception(_CallAbandoned())
+                pending.exception()
+                raise
+            except Exception as e:
+                pending.set_exception(e)
+                # Mark the exception as retrieved when nobody else was waiting
+                pending.exception()
+                raise
+            else:
+                cache.set(key, value)
+                pending.set_result(value)
+                return value
+            finally:
+                in_flight.pop(key, None)
+
+        wrapper.cache = cache
+        return wrapper
+    return decorator
@@ -1,26 +1,66 @@
+import logging
+
 from google.adk.tools import FunctionTool
 
-def get_weather(city: str) -> dict:
-    """Retrieves the current weather report for a specified city."""
-    print(f"--- Tool: get_weather called for city: {city} ---")
-    mock_weather_db = {
-        "new york": "sunny with a temperature of 25°C.",
-        "london": "cloudy with a temperature of 15°C.",
-    }
-    report = mock_weather_db.get(city.lower(), "weather data not available for this city.")
+from .tool_backends import async_tool, backend_url, get_http_client, run_blocking
+
+logger = logging.getLogger(__name__)
+
+# In-process mock data, used when no TOOL_BACKEND_URL is configured and served
+# over HTTP by `mock_data_server.py` when it is.
+MOCK_WEATHER_DB = {
+    "new york": "sunny with a temperature of 25°C.",
+    "london": "cloudy with a temperature of 15°C.",
+}
+MOCK_STOCK_DB = {
+    "GOOGL": "175.50 USD",
+    "GOOG": "176.50 USD",
+    "MSFT": "427.80 USD",
+}
+
+
+# --- Backends ---
+# Each tool has an async HTTP backend that uses the shared connection pool and
+# a local fallback. The fallbacks are plain functions and run on the tool
+# thread pool, as any blocking client library would.
+def lookup_weather_locally(city: str) -> dict:
+    report = MOCK_WEATHER_DB.get(city.lower(), "weather data not available for this city.")
     return {"weather_report": report}
 
-def get_stock_price(ticker: str) -> dict:
-    """Retrieves the current stock price for a given ticker symbol."""
-    print(f"--- Tool: get_stock_price called for ticker: {ticker} ---")
-    mock_stock_db = {
-        "GOOGL": "175.50 USD",
-        "GOOG": "176.50 USD",
-        "MSFT": "427.80 USD",
-    }
-    price = mock_stock_db.get(ticker.upper(), "stock price not available for this ticker.")
+
+def lookup_stock_price_locally(ticker: str) -> dict:
+    price = MOCK_STOCK_DB.get(ticker.upper(), "stock price not available for this ticker.")
     return {"stock_price": price}
 
+
+async def fetch_json(path: str) -> dict:
+    response = await get_http_client().get(path)
+    response.raise_for_status()
+    return response.json()
+
+
+# --- Tools ---
+@async_tool(ttl_seconds=300)
+async def get_weather(city: str) -> dict:
+    """Retrieves the current weather report for a specified city."""
+    logger.debug(f"get_weather called for city: {city}")
+    if backend_url() is None:
+        return await run_blocking(lookup_weather_locally, city)
+
+    data = await fetch_json(f"/weather/{city}")
+    return {"weather_report": data["weather_report"] or "weather data not available for this city."}
+
+
+@async_tool(ttl_seconds=60)
+async def get_stock_price(ticker: str) -> dict:
+    """Retrieves the current stock price for a given ticker symbol."""
+    logger.debug(f"get_stock_price called for ticker: {ticker}")
+    if backend_url() is None:
+        return await run_blocking(lookup_stock_price_locally, ticker)
+
+    data = await fetch_json(f"/stock/{ticker}")
+    return {"stock_price": data["stock_price"] or "stock price not available for this ticker."}
+
 # Expose tools for the agent to use
 weather_tool = FunctionTool(func=get_weather)
-stock_tool = FunctionTool(func=get_stock_price)
\ No newline at end of file
+stock_tool = FunctionTool(func=get_stock_price)
@@ -1,62 +1,84 @@
 import asyncio
 import os
-from google.adk.sessions import DatabaseSessionService, Session
-from google.adk.events import Event, EventActions
-from google.genai import types
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+from google.adk.sessions import DatabaseSessionService
+
+from agent_app.agent import root_agent
+from db_config import ANALYSIS_SQLITE_PROFILE, create_session_service
+from analytics_store import create_tables, fresh_session_keys, newest_event_times, upsert_analysis
+from analyzers import build_columns, run_analyzers, specialist_names, sub_agent_names
+from session_scan import ScannedSession, create_scan_indexes, iter_sessions
+from usage_ledger import fetch_session_usage, has_ledger_table, newest_usage_ids
 
 # --- Configuration ---
 # This MUST match the configuration used by the `adk web` command
 APP_NAME = "my_agent_app"
 DB_URL = "sqlite:///./sessions.db"
+# Number of sessions whose events are loaded into one columnar batch
+ANALYSIS_BATCH_SIZE = 100
+# Specialist agents are discovered from the agent tree rather than hardcoded
+SPECIALIST_NAMES = specialist_names(root_agent)
+SUB_AGENT_NAMES = sub_agent_names(root_agent)
 
 # --- Analysis Logic ---
-def analyze_session(session: Session) -> dict:
-    """Performs analysis on a single session and returns the results."""
-    print(f"-> Analyzing session: {session.id} for user: {session.user_id}")
-
-    # Count turns by counting user-authored events
-    turn_count = sum(1 for event in session.events if event.author == 'user')
-
-    # Calculate session duration
-    first_event_ts = session.events[0].timestamp if session.events else 0
-    last_event_ts = session.events[-1].timestamp if session.events else 0
-    duration_seconds = round(last_event_ts - first_event_ts, 2)
-
-    # Identify which specialist agents were used
-    used_specialists = list(set(
-        event.author for event in session.events
-        if event.author in ["WeatherAgent", "StockAgent"]
-    ))
-
-    analysis_results = {
-        "turn_count": turn_count,
-        "duration_seconds": duration_seconds,
-        "used_specialists": used_specialists,
-        "analysis_timestamp": session.last_update_time # Record when analysis was run
-    }
-
-    print(f"   -> Analysis complete: {analysis_results}")
-    return analysis_results
+async def analyze_sessions(
+    sessions: List[ScannedSession],
+    newest_events: Optional[Dict[Tuple[str, str], datetime]] = None,
+    newest_usage: Optional[Dict[Tuple[str, str], int]] = None,
+) -> List[Tuple[ScannedSession, dict]]:
+    """
+    Analyzes a batch of sessions and returns (session, results) pairs.
+
+    The events of the whole batch are encoded once into NumPy columns and
+    every registered analyzer runs a single vectorised pass over them.
+    Sessions without events are left out of the results. `newest_events`
+    and `newest_usage` hold the newest event timestamp and usage-ledger row
+    id per session, read before the analysis, and are stored with the
+    results to tell when they become stale.
+    """
+    print(f"-> Analyzing batch of {len(sessions)} session(s)")
+    columns = await build_columns(sessions, SPECIALIST_NAMES, SUB_AGENT_NAMES)
+    usage = load_model_usage(columns.sessions)
+
+    analyzed = []
+    for session, analysis_results in zip(columns.sessions, run_analyzers(columns)):
+        analysis_results["model_usage"] = usage.get((session.user_id, session.id), [])
+        analysis_results["analysis_timestamp"] = session.last_update_time # Record when analysis was run
+        analysis_results["last_event_time"] = (newest_events or {}).get((session.user_id, session.id))
+        analysis_results["last_usage_id"] = (newest_usage or {}).get((session.user_id, session.id))
+        print(f"   -> {session.id} ({session.user_id}): {analysis_results}")
+        analyzed.append((session, analysis_results))
+    return analyzed
+
+def load_model_usage(sessions: List[ScannedSession]) -> Dict[Tuple[str, str], List[dict]]:
+    """
+    Aggregates tokens, cost and cache/routing savings per session and model from the usage ledger.
+
+    One grouped query covers the whole batch. Sessions recorded before the
+    ledger existed (or without `python main.py`) simply have no usage rows.
+    """
+    if not sessions:
+        return {}
+    session_service = sessions[0].session_service
+    if not has_ledger_table(session_service.db_engine):
+        return {}
+    with session_service.database_session_factory() as db_session:
+        return fetch_session_usage(db_session, APP_NAME, ((s.user_id, s.id) for s in sessions))
 
 # --- Data Persistence Logic ---
-async def append_analysis_to_session(session_service: DatabaseSessionService, session: Session, analysis_data: dict):
-    """Appends analysis results to a session by creating and saving a new event."""
-    print(f"-> Appending analysis to session {session.id}...")
-
-    # The analysis results are a state change, stored under a specific key.
-    state_delta_for_analysis = {
-        "post_analysis_v1": analysis_data
-    }
-
-    analysis_event = Event(
-        author="analysis_bot",
-        invocation_id=f"analysis_{session.id}",
-        actions=EventActions(state_delta=state_delta_for_analysis),
-        content=types.Content(parts=[types.Part(text=f"Post-session analysis completed.")])
-    )
-
-    await session_service.append_event(session=session, event=analysis_event)
-    print(f"   -> Successfully appended analysis for session {session.id}.")
+def store_analysis_results(session_service: DatabaseSessionService, analyzed: List[Tuple[ScannedSession, dict]]):
+    """
+    Upserts a batch of analysis results into the `session_analytics` table.
+
+    Results live in their own typed, indexed table rather than in the session
+    state, so the chat runtime's state writes never carry analysis payloads.
+    """
+    with session_service.database_session_factory() as db_session:
+        for session, analysis_data in analyzed:
+            upsert_analysis(db_session, APP_NAME, session.user_id, session.id, analysis_data)
+        db_session.commit()
+    print(f"   -> Stored analysis for {len(analyzed)} session(s).")
 
 # --- Main Execution ---
 async def main():
@@ -66,38 +88,53 @@ async def main():
         print(f"Database file not found at '{DB_URL}'. Please run the `adk web` command first to generate sessions.")
         return
 
-    session_service = DatabaseSessionService(db_url=DB_URL)
+    session_service = create_session_service(DB_URL, ANALYSIS_SQLITE_PROFILE)
 
-    # In a real system, you might list all users. For this example, we assume we know them.
-    # We will get all sessions for all users of this app.
-    list_response = await session_service.list_sessions(app_name=APP_NAME, user_id="terminal_user_01")
+    create_tables(session_service.db_engine)
+    create_scan_indexes(session_service.db_engine)
+    ledger_exists = has_ledger_table(session_service.db_engine)
 
-    if not list_response.sessions:
-        print(f"No sessions found for app '{APP_NAME}' and user 'terminal_user_01'.")
-        return
-
-    print(f"Found {len(list_response.sessions)} sessions to process.")
+    # Stream every session of this app across all users. Sessions are paged
+    # from the database and their events are loaded lazily one batch at a
+    # time, so memory stays flat regardless of how many sessions exist.
+    sessions_seen = 0
     sessions_analyzed = 0
-
-    for session_summary in list_response.sessions:
-        full_session = await session_service.get_session(
-            app_name=APP_NAME,
-            user_id=session_summary.user_id,
-            session_id=session_summary.id
-        )
-
-        # Check if analysis has already been performed to avoid re-processing
-        if "post_analysis_v1" in full_session.state:
-            print(f"Session {full_session.id} already analyzed. Skipping.")
-            continue
-
-        if not full_session.events:
-            print(f"Session {full_session.id} has no events. Skipping.")
-            continue
-
-        results = analyze_session(full_session)
-        await append_analysis_to_session(session_service, full_session, results)
-        sessions_analyzed += 1
+    pending: List[ScannedSession] = []
+
+    async def flush_batch():
+        nonlocal sessions_analyzed
+        # Skip sessions whose stored results already cover their newest event
+        # and usage-ledger row. Read the markers before the data, so events or
+        # ledger rows written meanwhile make the results stale instead of being missed.
+        keys = [(s.user_id, s.id) for s in pending]
+        with session_service.database_session_factory() as db_session:
+            newest = newest_event_times(db_session, APP_NAME, keys)
+            newest_usage = newest_usage_ids(db_session, APP_NAME, keys) if ledger_exists else {}
+            fresh = fresh_session_keys(db_session, APP_NAME, {key: newest.get(key) for key in keys}, newest_usage)
+        stale = [s for s in pending if (s.user_id, s.id) not in fresh]
+        pending.clear()
+        for session_id in sorted(session_id for _, session_id in fresh):
+            print(f"Session {session_id} already analyzed. Skipping.")
+        if not stale:
+            return
+
+        analyzed = await analyze_sessions(stale, newest, newest_usage)
+        if analyzed:
+            store_analysis_results(session_service, analyzed)
+        sessions_analyzed += len(analyzed)
+
+    async for scanned_session in iter_sessions(session_service, APP_NAME):
+        sessions_seen += 1
+        pending.append(scanned_session)
+        if len(pending) >= ANALYSIS_BATCH_SIZE:
+            await flush_batch()
+
+    if pending:
+        await flush_batch()
+
+    if sessions_seen == 0:
+        print(f"No sessions found for app '{APP_NAME}'.")
+        return
 
     print(f"\n--- Analysis Complete. Processed {sessions_analyzed} new sessions. ---")
 
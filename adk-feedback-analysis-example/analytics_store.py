@@ -0,0 +1,341 @@
+import asyncio
+import os
+import sys
+from datetime import datetime
+from typing import Any, Dict, Iterable, Optional, Set, Tuple
+
+from sqlalchemy import (
+    DateTime, Float, ForeignKeyConstraint, Index, Integer, String, and_, delete, func, inspect, or_, select, text, tuple_,
+)
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column
+from sqlalchemy.orm import Session as DBSession
+from google.adk.sessions import DatabaseSessionService
+from google.adk.sessions.database_session_service import (
+    DEFAULT_MAX_KEY_LENGTH, DynamicJSON, PreciseTimestamp, StorageEvent,
+)
+
+from db_config import ANALYSIS_SQLITE_PROFILE, create_session_service
+from session_scan import create_scan_indexes, iter_sessions
+
+# --- Configuration ---
+# This MUST match the configuration used by your other scripts
+APP_NAME = "my_agent_app"
+DB_URL = "sqlite:///./sessions.db"
+# Results of the current analyzer set. Bump this when analyzers change meaning
+# so old and new results can live side by side.
+ANALYZER_VERSION = "post_analysis_v1"
+# Session-state key that older versions of `analysis.py` wrote results to
+LEGACY_STATE_KEY = "post_analysis_v1"
+BACKFILL_COMMIT_SIZE = 200
+
+
+# --- Schema ---
+class Base(DeclarativeBase):
+    """Base class for the analytics tables, kept apart from ADK's session schema."""
+    pass
+
+
+class SessionAnalytics(Base):
+    """One row of typed analysis results per session and analyzer version."""
+    __tablename__ = "session_analytics"
+
+    app_name: Mapped[str] = mapped_column(String(DEFAULT_MAX_KEY_LENGTH), primary_key=True)
+    user_id: Mapped[str] = mapped_column(String(DEFAULT_MAX_KEY_LENGTH), primary_key=True)
+    session_id: Mapped[str] = mapped_column(String(DEFAULT_MAX_KEY_LENGTH), primary_key=True)
+    analyzer_version: Mapped[str] = mapped_column(String(DEFAULT_MAX_KEY_LENGTH), primary_key=True)
+
+    turn_count: Mapped[int] = mapped_column(Integer)
+    duration_seconds: Mapped[float] = mapped_column(Float)
+    tool_call_count: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
+    mean_turn_latency_seconds: Mapped[Optional[float]] = mapped_column(Float, nullable=True)
+    # Results of analyzers registered without a column of their own, keyed by analyzer name
+    extra_results: Mapped[Optional[Dict[str, Any]]] = mapped_column(DynamicJSON, nullable=True)
+
+    # update_time of the session when it was analysed
+    session_update_time: Mapped[datetime] = mapped_column(DateTime())
+    # Timestamp of the newest event the results cover; used to detect stale results.
+    # ADK only bumps update_time on state changes, so it cannot serve this purpose.
+    last_event_time: Mapped[Optional[datetime]] = mapped_column(PreciseTimestamp, nullable=True)
+    # Id of the newest usage-ledger row the results cover. Ledger rows are
+    # written after the turn's events, so new events alone would miss them.
+    last_usage_id: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
+    analyzed_at: Mapped[datetime] = mapped_column(DateTime(), default=func.now(), onupdate=func.now())
+
+    __table_args__ = (
+        # Covering indexes so reports can filter by version and rank metrics without touching the table
+        Index("ix_session_analytics_turns", "app_name", "analyzer_version", "turn_count"),
+        Index("ix_session_analytics_duration", "app_name", "analyzer_version", "duration_seconds"),
+    )
+
+
+class SessionSpecialistUsage(Base):
+    """One row per specialist agent used in an analysed session."""
+    __tablename__ = "session_analytics_specialists"
+
+    app_name: Mapped[str] = mapped_column(String(DEFAULT_MAX_KEY_LENGTH), primary_key=True)
+    user_id: Mapped[str] = mapped_column(String(DEFAULT_MAX_KEY_LENGTH), primary_key=True)
+    session_id: Mapped[str] = mapped_column(String(DEFAULT_MAX_KEY_LENGTH), primary_key=True)
+    analyzer_version: Mapped[str] = mapped_column(String(DEFAULT_MAX_KEY_LENGTH), primary_key=True)
+    specialist: Mapped[str] = mapped_column(String(DEFAULT_MAX_KEY_LENGTH), primary_key=True)
+
+    __table_args__ = (
+        ForeignKeyConstraint(
+            ["app_name", "user_id", "session_id", "analyzer_version"],
+            [
+                "session_analytics.app_name",
+                "session_analytics.user_id",
+                "session_analytics.session_id",
+                "session_analytics.analyzer_version",
+            ],
+            ondelete="CASCADE",
+        ),
+        Index("ix_session_analytics_specialists_usage", "app_name", "analyzer_version", "specialist"),
+    )
+
+
+class SessionModelUsage(Base):
+    """Token and cost totals of an analysed session per model, aggregated from the usage ledger."""
+    __tablename__ = "session_analytics_usage"
+
+    app_name: Mapped[str] = mapped_column(String(DEFAULT_MAX_KEY_LENGTH), primary_key=True)
+    user_id: Mapped[str] = mapped_column(String(DEFAULT_MAX_KEY_LENGTH), primary_key=True)
+    session_id: Mapped[str] = mapped_column(String(DEFAULT_MAX_KEY_LENGTH), primary_key=True)
+    analyzer_version: Mapped[str] = mapped_column(String(DEFAULT_MAX_KEY_LENGTH), primary_key=True)
+    model: Mapped[str] = mapped_column(String(DEFAULT_MAX_KEY_LENGTH), primary_key=True)
+
+    calls: Mapped[int] = mapped_column(Integer)
+    prompt_tokens: Mapped[int] = mapped_column(Integer)
+    cached_tokens: Mapped[int] = mapped_column(Integer)
+    output_tokens: Mapped[int] = mapped_column(Integer)
+    cost_usd: Mapped[float] = mapped_column(Float)
+    cache_hits: Mapped[int] = mapped_column(Integer)
+    cache_saved_usd: Mapped[float] = mapped_column(Float)
+    routing_saved_usd: Mapped[float] = mapped_column(Float)
+
+    __table_args__ = (
+        ForeignKeyConstraint(
+            ["app_name", "user_id", "session_id", "analyzer_version"],
+            [
+                "session_analytics.app_name",
+                "session_analytics.user_id",
+                "session_analytics.session_id",
+                "session_analytics.analyzer_version",
+            ],
+            ondelete="CASCADE",
+        ),
+        Index("ix_session_analytics_usage_model", "app_name", "analyzer_version", "model"),
+    )
+
+
+def create_tables(engine: Engine) -> None:
+    """Creates the analytics tables if they do not exist yet."""
+    Base.metadata.create_all(engine)
+
+    # Tables created by earlier versions get newer columns added in place. Rows
+    # keep NULL; a NULL `last_event_time` counts as stale until analysed again.
+    columns = {column["name"] for column in inspect(engine).get_columns(SessionAnalytics.__tablename__)}
+    for name in ("last_event_time", "last_usage_id", "extra_results"):
+        if name in columns:
+            continue
+        column_type = SessionAnalytics.__table__.c[name].type.compile(engine.dialect)
+        with engine.begin() as connection:
+            connection.execute(text(f"ALTER TABLE {SessionAnalytics.__tablename__} ADD COLUMN {name} {column_type}"))
+
+
+# --- Writes ---
+# Result keys stored in their own columns or tables rather than in `extra_results`
+STORED_RESULT_KEYS = frozenset({
+    "turn_count",
+    "duration_seconds",
+    "tool_call_count",
+    "mean_turn_latency_seconds",
+    "used_specialists",
+    "model_usage",
+    "analysis_timestamp",
+    "last_event_time",
+    "last_usage_id",
+})
+
+
+def upsert_analysis(
+    db_session: DBSession,
+    app_name: str,
+    user_id: str,
+    session_id: str,
+    results: Dict[str, Any],
+    analyzer_version: str = ANALYZER_VERSION,
+) -> None:
+    """
+    Inserts or replaces the analysis results of one session.
+
+    Uses a native INSERT ... ON CONFLICT DO UPDATE on SQLite and Postgres and
+    falls back to an ORM merge elsewhere. Results of analyzers without a
+    column of their own (see `analyzers.register_analyzer`) are kept in the
+    `extra_results` JSON column. The caller commits.
+    """
+    key = {"app_name": app_name, "user_id": user_id, "session_id": session_id, "analyzer_version": analyzer_version}
+    values = {
+        **key,
+        "turn_count": int(results["turn_count"]),
+        "duration_seconds": float(results["duration_seconds"]),
+        "tool_call_count": results.get("tool_call_count"),
+        "mean_turn_latency_seconds": results.get("mean_turn_latency_seconds"),
+        "session_update_time": datetime.fromtimestamp(results["analysis_timestamp"]),
+        "last_event_time": results.get("last_event_time"),
+        "last_usage_id": results.get("last_usage_id"),
+        "extra_results": {name: value for name, value in results.items() if name not in STORED_RESULT_KEYS} or None,
+        "analyzed_at": datetime.now(),
+    }
+
+    dialect = db_session.get_bind().dialect.name
+    if dialect in ("sqlite", "postgresql"):
+        insert = sqlite.insert if dialect == "sqlite" else postgresql.insert
+        stmt = insert(SessionAnalytics).values(**values)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=list(key),
+            set_={column: stmt.excluded[column] for column in values if column not in key},
+        )
+        db_session.execute(stmt)
+    else:
+        db_session.merge(SessionAnalytics(**values))
+
+    # Specialist rows are replaced wholesale; a session's list is tiny
+    db_session.execute(delete(SessionSpecialistUsage).where(*(
+        getattr(SessionSpecialistUsage, column) == value for column, value in key.items()
+    )))
+    db_session.add_all(
+        SessionSpecialistUsage(**key, specialist=specialist)
+        for specialist in sorted(set(results.get("used_specialists", [])))
+    )
+
+    # Usage rows are replaced the same way; there is one per model the session used
+    db_session.execute(delete(SessionModelUsage).where(*(
+        getattr(SessionModelUsage, column) == value for column, value in key.items()
+    )))
+    db_session.add_all(SessionModelUsage(**key, **usage) for usage in results.get("model_usage", []))
+
+
+# --- Reads ---
+def newest_event_times(
+    db_session: DBSession, app_name: str, session_keys: Iterable[Tuple[str, str]]
+) -> Dict[Tuple[str, str], datetime]:
+    """
+    Returns the timestamp of the newest stored event per (user_id, session_id), in one grouped query.
+
+    Sessions without events in the hot `events` table are left out.
+    """
+    session_keys = list(session_keys)
+    if not session_keys:
+        return {}
+
+    stmt = select(
+        StorageEvent.user_id, StorageEvent.session_id, func.max(StorageEvent.timestamp)
+    ).where(
+        StorageEvent.app_name == app_name,
+        tuple_(StorageEvent.user_id, StorageEvent.session_id).in_(session_keys),
+    ).group_by(StorageEvent.user_id, StorageEvent.session_id)
+    return {(user_id, session_id): newest for user_id, session_id, newest in db_session.execute(stmt)}
+
+
+def fresh_session_keys(
+    db_session: DBSession,
+    app_name: str,
+    newest_events: Dict[Tuple[str, str], Optional[datetime]],
+    newest_usage: Optional[Dict[Tuple[str, str], int]] = None,
+    analyzer_version: str = ANALYZER_VERSION,
+) -> Set[Tuple[str, str]]:
+    """
+    Returns the (user_id, session_id) pairs whose stored results are up to date.
+
+    `newest_events` maps each session to its newest event timestamp, as
+    returned by `newest_event_times` (None when the session has no hot
+    events). `newest_usage` maps sessions to their newest usage-ledger row
+    id (`usage_ledger.newest_usage_ids`). A result is fresh when it already
+    covers both.
+    """
+    if not newest_events:
+        return set()
+    newest_usage = newest_usage or {}
+
+    def covers_usage(key: Tuple[str, str], analysed_usage_id: Optional[int]) -> bool:
+        return key not in newest_usage or (analysed_usage_id is not None and analysed_usage_id >= newest_usage[key])
+
+    stmt = select(
+        SessionAnalytics.user_id,
+        SessionAnalytics.session_id,
+        SessionAnalytics.last_event_time,
+        SessionAnalytics.last_usage_id,
+    ).where(
+        SessionAnalytics.app_name == app_name,
+        SessionAnalytics.analyzer_version == analyzer_version,
+        SessionAnalytics.last_event_time.is_not(None),
+        tuple_(SessionAnalytics.user_id, SessionAnalytics.session_id).in_(list(newest_events)),
+    )
+    return {
+        (user_id, session_id)
+        for user_id, session_id, analysed_through, analysed_usage_id in db_session.execute(stmt)
+        if (newest_events[(user_id, session_id)] is None or analysed_through >= newest_events[(user_id, session_id)])
+        and covers_usage((user_id, session_id), analysed_usage_id)
+    }
+
+
+# --- Backfill ---
+async def backfill(session_service: DatabaseSessionService, app_name: str = APP_NAME) -> int:
+    """Copies results that older runs stored in session state into the analytics table."""
+    create_tables(session_service.db_engine)
+    create_scan_indexes(session_service.db_engine)
+    backfilled = 0
+    pending = []
+
+    def write_batch() -> None:
+        # Stamp the rows with the session's current update time and newest
+        # event, so the next `analysis.py` run treats them as fresh. The read
+        # gets its own transaction: a deferred transaction that reads and then
+        # writes fails at once if the chat runtime commits in between.
+        with session_service.database_session_factory() as db_session:
+            newest = newest_event_times(db_session, app_name, ((s.user_id, s.id) for s, _ in pending))
+        with session_service.database_session_factory() as db_session:
+            for scanned_session, legacy_results in pending:
+                upsert_analysis(db_session, app_name, scanned_session.user_id, scanned_session.id, {
+                    **legacy_results,
+                    "analysis_timestamp": scanned_session.last_update_time,
+                    "last_event_time": newest.get((scanned_session.user_id, scanned_session.id)),
+                })
+            db_session.commit()
+        pending.clear()
+
+    async for scanned_session in iter_sessions(session_service, app_name, include_state=True):
+        legacy_results = scanned_session.state.get(LEGACY_STATE_KEY)
+        if not legacy_results:
+            continue
+
+        pending.append((scanned_session, legacy_results))
+        backfilled += 1
+        if len(pending) >= BACKFILL_COMMIT_SIZE:
+            write_batch()
+            print(f"   -> Backfilled {backfilled} sessions...")
+    if pending:
+        write_batch()
+
+    return backfilled
+
+
+async def main():
+    if sys.argv[1:] != ["backfill"]:
+        print("Usage: python analytics_store.py backfill")
+        return
+
+    print("--- Backfilling Session Analytics Table ---")
+    if not os.path.exists(DB_URL.replace("sqlite:///", "")):
+        print(f"Database file not found at '{DB_URL}'. Nothing to backfill.")
+        return
+
+    session_service = create_session_service(DB_URL, ANALYSIS_SQLITE_PROFILE)
+    backfilled = await backfill(session_service)
+    print(f"\n--- Backfill Complete. Copied {backfilled} analysed sessions. ---")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
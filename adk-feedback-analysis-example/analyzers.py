@@ -0,0 +1,215 @@
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from google.adk.agents import BaseAgent
+from google.adk.tools.agent_tool import AgentTool
+
+from session_scan import ScannedSession
+
+# --- Analyzer Registry ---
+# Each analyzer receives the columnar view of a whole batch of sessions and
+# returns one value per session, in the same order as `EventColumns.sessions`.
+Analyzer = Callable[["EventColumns"], Sequence[Any]]
+ANALYZERS: Dict[str, Analyzer] = {}
+# Bookkeeping events appended by older versions of `analysis.py`; they are not
+# part of the conversation and would otherwise stretch session durations.
+IGNORED_AUTHORS = ("analysis_bot",)
+
+
+def register_analyzer(name: str) -> Callable[[Analyzer], Analyzer]:
+    """Registers a vectorised analyzer under the given result key."""
+    def decorator(func: Analyzer) -> Analyzer:
+        ANALYZERS[name] = func
+        return func
+    return decorator
+
+
+def specialist_names(agent: BaseAgent) -> Tuple[str, ...]:
+    """Collects the names of every agent reachable from `agent` via AgentTools or sub-agents."""
+    names = []
+    children = [tool.agent for tool in getattr(agent, "tools", []) if isinstance(tool, AgentTool)]
+    children.extend(agent.sub_agents)
+    for child in children:
+        names.append(child.name)
+        names.extend(specialist_names(child))
+    return tuple(dict.fromkeys(names))
+
+
+def sub_agent_names(agent: BaseAgent) -> Tuple[str, ...]:
+    """
+    Collects the names of the sub-agents that run inside the user's session.
+
+    Only these author events in the stored session. AgentTool specialists run
+    in a separate in-memory session and show up as function calls instead.
+    """
+    names = []
+    for child in agent.sub_agents:
+        names.append(child.name)
+        names.extend(sub_agent_names(child))
+    return tuple(dict.fromkeys(names))
+
+
+# --- Columnar Event View ---
+@dataclass
+class EventColumns:
+    """
+    Events of a batch of sessions laid out as parallel NumPy arrays.
+
+    Events are grouped by session and ordered by timestamp within each
+    session; `offsets[i]` is the index of the first event of session `i`.
+    """
+    sessions: List[ScannedSession]
+    offsets: np.ndarray
+    session_index: np.ndarray
+    timestamps: np.ndarray
+    author_codes: np.ndarray
+    invocation_codes: np.ndarray
+    tool_call_counts: np.ndarray
+    # (events x specialists) count of function calls naming each specialist
+    specialist_call_counts: np.ndarray
+    authors: List[str]
+    specialist_names: Tuple[str, ...]
+    sub_agent_names: Tuple[str, ...] = ()
+
+    def author_code(self, author: str) -> int:
+        """Returns the code of `author` in this batch, or -1 if it never appears."""
+        try:
+            return self.authors.index(author)
+        except ValueError:
+            return -1
+
+
+async def build_columns(
+    sessions: Sequence[ScannedSession], specialists: Sequence[str], sub_agents: Sequence[str] = ()
+) -> EventColumns:
+    """Streams the events of `sessions` once and encodes them as an `EventColumns` batch."""
+    specialists = tuple(specialists)
+    author_lookup: Dict[str, int] = {}
+    invocation_lookup: Dict[Tuple[int, str], int] = {}
+    kept_sessions = []
+    offsets = []
+    session_index = []
+    timestamps = []
+    author_codes = []
+    invocation_codes = []
+    tool_call_counts = []
+    specialist_call_counts = []
+
+    for session in sessions:
+        start = len(timestamps)
+        position = len(kept_sessions)
+        async for event in session.events():
+            if event.author in IGNORED_AUTHORS:
+                continue
+            session_index.append(position)
+            timestamps.append(event.timestamp)
+            author_codes.append(author_lookup.setdefault(event.author, len(author_lookup)))
+            invocation_key = (position, event.invocation_id)
+            invocation_codes.append(invocation_lookup.setdefault(invocation_key, len(invocation_lookup)))
+            call_names = [function_call.name for function_call in event.get_function_calls()]
+            tool_call_counts.append(len(call_names))
+            # An AgentTool is called under the name of the agent it wraps
+            specialist_call_counts.append([call_names.count(name) for name in specialists])
+
+        # Sessions without events carry no information for the analyzers
+        if len(timestamps) > start:
+            kept_sessions.append(session)
+            offsets.append(start)
+
+    return EventColumns(
+        sessions=kept_sessions,
+        offsets=np.asarray(offsets, dtype=np.int64),
+        session_index=np.asarray(session_index, dtype=np.int32),
+        timestamps=np.asarray(timestamps, dtype=np.float64),
+        author_codes=np.asarray(author_codes, dtype=np.int32),
+        invocation_codes=np.asarray(invocation_codes, dtype=np.int32),
+        tool_call_counts=np.asarray(tool_call_counts, dtype=np.int32),
+        specialist_call_counts=np.asarray(specialist_call_counts, dtype=np.int32).reshape(len(timestamps), len(specialists)),
+        authors=list(author_lookup),
+        specialist_names=specialists,
+        sub_agent_names=tuple(sub_agents),
+    )
+
+
+def run_analyzers(columns: EventColumns, names: Optional[Sequence[str]] = None) -> List[Dict[str, Any]]:
+    """Runs the selected analyzers (all registered ones by default) and returns one result dict per session."""
+    results = [{} for _ in columns.sessions]
+    if not results:
+        return results
+
+    for name in names or ANALYZERS:
+        values = ANALYZERS[name](columns)
+        for result, value in zip(results, values):
+            result[name] = value
+    return results
+
+
+# --- Built-in Analyzers ---
+@register_analyzer("turn_count")
+def turn_count(columns: EventColumns) -> List[int]:
+    """Counts turns by counting user-authored events."""
+    user_mask = columns.author_codes == columns.author_code("user")
+    counts = np.bincount(columns.session_index[user_mask], minlength=len(columns.sessions))
+    return counts.tolist()
+
+
+@register_analyzer("duration_seconds")
+def duration_seconds(columns: EventColumns) -> List[float]:
+    """Time between the first and the last event of each session."""
+    first = np.minimum.reduceat(columns.timestamps, columns.offsets)
+    last = np.maximum.reduceat(columns.timestamps, columns.offsets)
+    return np.round(last - first, 2).tolist()
+
+
+@register_analyzer("used_specialists")
+def used_specialists(columns: EventColumns) -> List[List[str]]:
+    """
+    Lists the specialist agents used in each session.
+
+    AgentTool specialists are detected from function calls naming them;
+    sub-agents, which run inside the session, from the events they author.
+    """
+    session_count = len(columns.sessions)
+    used = [[] for _ in columns.sessions]
+    for column, specialist in enumerate(columns.specialist_names):
+        hits = np.bincount(
+            columns.session_index, weights=columns.specialist_call_counts[:, column], minlength=session_count
+        )
+        if specialist in columns.sub_agent_names:
+            code = columns.author_code(specialist)
+            if code >= 0:
+                hits += np.bincount(columns.session_index[columns.author_codes == code], minlength=session_count)
+        for position in np.flatnonzero(hits):
+            used[position].append(specialist)
+    return used
+
+
+@register_analyzer("tool_call_count")
+def tool_call_count(columns: EventColumns) -> List[int]:
+    """Counts function calls issued in each session, including AgentTool delegations."""
+    counts = np.bincount(
+        columns.session_index, weights=columns.tool_call_counts, minlength=len(columns.sessions)
+    )
+    return counts.astype(np.int64).tolist()
+
+
+@register_analyzer("mean_turn_latency_seconds")
+def mean_turn_latency_seconds(columns: EventColumns) -> List[float]:
+    """Average time from a user message to the last event of the invocation it started."""
+    invocation_count = int(columns.invocation_codes.max()) + 1
+    first = np.full(invocation_count, np.inf)
+    last = np.full(invocation_count, -np.inf)
+    np.minimum.at(first, columns.invocation_codes, columns.timestamps)
+    np.maximum.at(last, columns.invocation_codes, columns.timestamps)
+
+    # Only invocations that start with a user message count as turns
+    user_mask = columns.author_codes == columns.author_code("user")
+    turn_codes, turn_positions = np.unique(columns.invocation_codes[user_mask], return_index=True)
+    turn_sessions = columns.session_index[user_mask][turn_positions]
+    latencies = last[turn_codes] - first[turn_codes]
+
+    totals = np.bincount(turn_sessions, weights=latencies, minlength=len(columns.sessions))
+    counts = np.bincount(turn_sessions, minlength=len(columns.sessions))
+    means = np.divide(totals, counts, out=np.zeros_like(totals), where=counts > 0)
+    return np.round(means, 2).tolist()
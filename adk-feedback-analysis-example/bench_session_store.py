@@ -0,0 +1,191 @@
+"""
+Benchmarks the SQLite session store under a concurrent chat + analysis load.
+
+Several chat sessions append events from worker threads (as the chat runtime
+does when serving many users) while a separate process plays the role of
+`analysis.py`, repeatedly scanning sessions and loading their events. The
+same workload runs against ADK's default SQLite settings, against the
+production profile from `db_config.py`, and against the production profile
+with write-behind event persistence (flushed at the end of every turn).
+
+Usage:
+    python bench_session_store.py [--chat-sessions 8] [--turns 20] [--events-per-turn 6]
+"""
+import argparse
+import asyncio
+import multiprocessing
+import os
+import statistics
+import tempfile
+import threading
+import time
+import uuid
+from typing import Dict, List, Optional
+
+from google.adk.events import Event
+from google.adk.sessions import DatabaseSessionService, Session
+from google.genai import types
+
+from db_config import ANALYSIS_SQLITE_PROFILE, PRODUCTION_SQLITE_PROFILE, SqliteProfile, create_session_service
+from session_scan import iter_sessions
+from write_behind import WriteBehindSessionService
+
+APP_NAME = "bench_app"
+
+
+def percentile(samples: List[float], p: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(p * len(ordered)))]
+
+
+def make_service(db_url: str, profile: Optional[SqliteProfile]) -> DatabaseSessionService:
+    if profile is None:
+        return DatabaseSessionService(db_url=db_url)
+    return create_session_service(db_url, profile)
+
+
+# --- Workloads ---
+def chat_worker(session_service: DatabaseSessionService, session: Session, turns: int, events_per_turn: int, stats: Dict):
+    """Simulates one chat session: every turn appends a user event plus agent/tool events."""
+    async def run():
+        nonlocal session
+        for turn in range(turns):
+            invocation_id = f"inv_{uuid.uuid4().hex[:8]}"
+            for index in range(events_per_turn):
+                author = "user" if index == 0 else ("WeatherAgent" if index % 2 else "RootFinancialWeatherAssistant")
+                event = Event(
+                    author=author,
+                    invocation_id=invocation_id,
+                    content=types.Content(role="user" if index == 0 else "model", parts=[types.Part(text="x" * 200)]),
+                )
+                started = time.perf_counter()
+                try:
+                    await session_service.append_event(session, event)
+                    stats["append_latencies"].append(time.perf_counter() - started)
+                except Exception as e:
+                    stats["errors"].append(str(e))
+                    # Reload the session so a failed write does not poison the next ones
+                    session = await session_service.get_session(
+                        app_name=APP_NAME, user_id=session.user_id, session_id=session.id
+                    )
+            # Write-behind services commit the whole turn here, like the chat loop does
+            if isinstance(session_service, WriteBehindSessionService):
+                started = time.perf_counter()
+                await session_service.flush()
+                stats["flush_latencies"].append(time.perf_counter() - started)
+        if isinstance(session_service, WriteBehindSessionService):
+            await session_service.close()
+    asyncio.run(run())
+
+
+def analysis_worker(db_url: str, profile: Optional[SqliteProfile], stop_at: float, results):
+    """Runs in a separate process, repeatedly scanning all sessions like `analysis.py`."""
+    session_service = make_service(db_url, profile)
+    read_latencies = []
+    errors = 0
+
+    async def run():
+        nonlocal errors
+        while time.time() < stop_at:
+            try:
+                async for scanned_session in iter_sessions(session_service, APP_NAME):
+                    started = time.perf_counter()
+                    async for _ in scanned_session.events():
+                        pass
+                    read_latencies.append(time.perf_counter() - started)
+            except Exception:
+                errors += 1
+            # Pause between passes, as a periodic analysis job would
+            await asyncio.sleep(0.05)
+    asyncio.run(run())
+    results.put((read_latencies, errors))
+
+
+# --- Benchmark Driver ---
+def run_benchmark(
+    name: str,
+    profile: Optional[SqliteProfile],
+    analysis_profile: Optional[SqliteProfile],
+    args,
+    write_behind: bool = False,
+) -> None:
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_url = f"sqlite:///{os.path.join(tmp_dir, 'sessions.db')}"
+        session_service = make_service(db_url, profile)
+        stats = {"append_latencies": [], "flush_latencies": [], "errors": []}
+
+        # Sessions are created up front: concurrent first-time creates race on
+        # ADK's app_states row, which is not what this benchmark measures
+        async def create_sessions():
+            return [
+                await session_service.create_session(app_name=APP_NAME, user_id=f"user_{i}")
+                for i in range(args.chat_sessions)
+            ]
+        sessions = asyncio.run(create_sessions())
+
+        results = multiprocessing.Queue()
+        analysis_process = multiprocessing.Process(
+            target=analysis_worker, args=(db_url, analysis_profile, time.time() + args.analysis_seconds, results)
+        )
+        analysis_process.start()
+
+        started = time.perf_counter()
+        # A write-behind journal belongs to one event loop, so each chat thread gets its own service
+        threads = [
+            threading.Thread(target=chat_worker, args=(
+                create_session_service(db_url, profile, write_behind=True) if write_behind else session_service,
+                session, args.turns, args.events_per_turn, stats,
+            ))
+            for session in sessions
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        read_latencies, read_errors = results.get()
+        analysis_process.join()
+        session_service.db_engine.dispose()
+
+    appends = stats["append_latencies"]
+    print(f"\n--- {name} ---")
+    print(f"  Event appends:          {len(appends)} in {elapsed:.2f}s ({len(appends) / elapsed:.1f} events/s)")
+    print(f"  Append latency (ms):    p50={percentile(appends, 0.5) * 1000:.2f}  "
+          f"p95={percentile(appends, 0.95) * 1000:.2f}  p99={percentile(appends, 0.99) * 1000:.2f}")
+    flushes = stats["flush_latencies"]
+    if flushes:
+        print(f"  Turn flush latency (ms): p50={percentile(flushes, 0.5) * 1000:.2f}  "
+              f"p95={percentile(flushes, 0.95) * 1000:.2f}  p99={percentile(flushes, 0.99) * 1000:.2f}")
+    print(f"  Session reads:          {len(read_latencies)}")
+    if read_latencies:
+        print(f"  Read latency (ms):      p50={percentile(read_latencies, 0.5) * 1000:.2f}  "
+              f"p95={percentile(read_latencies, 0.95) * 1000:.2f}  mean={statistics.mean(read_latencies) * 1000:.2f}")
+    print(f"  Write errors:           {len(stats['errors'])}"
+          + (f" (e.g. {stats['errors'][0][:60]!r})" if stats["errors"] else ""))
+    print(f"  Analysis scan errors:   {read_errors}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chat-sessions", type=int, default=8)
+    parser.add_argument("--turns", type=int, default=20)
+    parser.add_argument("--events-per-turn", type=int, default=6)
+    parser.add_argument("--analysis-seconds", type=float, default=5.0)
+    args = parser.parse_args()
+
+    print("--- Session Store Benchmark ---")
+    print(f"{args.chat_sessions} concurrent chat sessions x {args.turns} turns x {args.events_per_turn} events, "
+          f"plus a concurrent analysis process")
+    run_benchmark("Default SQLite settings", None, None, args)
+    run_benchmark("Production SQLite profile", PRODUCTION_SQLITE_PROFILE, ANALYSIS_SQLITE_PROFILE, args)
+    run_benchmark(
+        "Production SQLite profile + write-behind", PRODUCTION_SQLITE_PROFILE, ANALYSIS_SQLITE_PROFILE, args,
+        write_behind=True,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+Measures tool latency and event-loop blocking against the local mock data server.
+
+Starts `agent_app.mock_data_server` in the background with an artificial
+delay, then fires bursts of concurrent tool calls while a heartbeat task
+records how late the event loop wakes it up. A blocking tool shows up as
+large heartbeat lag; a well-behaved async tool keeps it near zero.
+
+Usage:
+    python bench_tools.py [--latency 0.2] [--concurrency 50] [--port 8765]
+"""
+import argparse
+import asyncio
+import os
+import time
+from typing import List
+
+from agent_app import tools
+from agent_app.mock_data_server import start_in_background
+from agent_app.tool_backends import BACKEND_URL_ENV, close_http_clients
+
+HEARTBEAT_INTERVAL = 0.005
+
+
+async def heartbeat(lags: List[float], stop: asyncio.Event) -> None:
+    """Records how much later than scheduled the loop resumes this task."""
+    while not stop.is_set():
+        expected = time.perf_counter() + HEARTBEAT_INTERVAL
+        await asyncio.sleep(HEARTBEAT_INTERVAL)
+        lags.append(max(0.0, time.perf_counter() - expected))
+
+
+async def run_burst(name: str, calls) -> None:
+    lags: List[float] = []
+    stop = asyncio.Event()
+    ticker = asyncio.create_task(heartbeat(lags, stop))
+
+    latencies = []
+
+    async def timed(call):
+        started = time.perf_counter()
+        await call
+        latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(timed(call) for call in calls))
+    elapsed = time.perf_counter() - started
+    stop.set()
+    await ticker
+
+    latencies.sort()
+    print(f"\n--- {name} ---")
+    print(f"  Calls:              {len(latencies)} in {elapsed * 1000:.1f} ms")
+    print(f"  Call latency (ms):  p50={latencies[len(latencies) // 2] * 1000:.2f}  max={latencies[-1] * 1000:.2f}")
+    print(f"  Max loop lag (ms):  {max(lags, default=0.0) * 1000:.2f}")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--latency", type=float, default=0.2)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    start_in_background(port=args.port, latency_seconds=args.latency)
+    os.environ[BACKEND_URL_ENV] = f"http://127.0.0.1:{args.port}"
+    print(f"--- Tool Backend Benchmark (mock latency {args.latency * 1000:.0f} ms) ---")
+
+    # Open the pooled client once so its one-off setup cost is not counted below
+    await tools.get_weather(city="warmup")
+
+    cities = [f"city_{i}" for i in range(args.concurrency)]
+    await run_burst("Cold: distinct cities over HTTP", [tools.get_weather(city=c) for c in cities])
+    await run_burst("Warm: same cities again (TTL cache)", [tools.get_weather(city=c) for c in cities])
+    tools.get_stock_price.cache.clear()
+    await run_burst("Deduplicated: one ticker requested concurrently", [
+        tools.get_stock_price(ticker="GOOGL") for _ in range(args.concurrency)
+    ])
+    await close_http_clients()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
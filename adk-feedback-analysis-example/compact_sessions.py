@@ -0,0 +1,84 @@
+import argparse
+import asyncio
+import os
+
+from sqlalchemy.exc import OperationalError
+
+from db_config import PRODUCTION_SQLITE_PROFILE, create_session_service
+from session_archive import ARCHIVE_CHUNK_EVENTS, KEEP_RECENT_EVENTS, compact_session, create_archive_tables
+from session_scan import create_scan_indexes, iter_sessions
+
+# --- Configuration ---
+# This MUST match the configuration used by your other scripts
+APP_NAME = "my_agent_app"
+DB_URL = "sqlite:///./sessions.db"
+
+
+async def compact_all(session_service, keep_recent: int, chunk_events: int) -> None:
+    """
+    Compacts every session of the app that holds more than `keep_recent` hot events.
+
+    A session whose compaction fails with a database error (e.g. the lock is
+    still held after the busy timeout) is skipped; the next run picks it up.
+    """
+    sessions_compacted = 0
+    sessions_skipped = 0
+    events_archived = 0
+
+    async for scanned_session in iter_sessions(session_service, APP_NAME):
+        try:
+            archived = await compact_session(
+                session_service,
+                APP_NAME,
+                scanned_session.user_id,
+                scanned_session.id,
+                keep_recent=keep_recent,
+                chunk_events=chunk_events,
+            )
+        except OperationalError as e:
+            print(f"-> Session {scanned_session.id} ({scanned_session.user_id}): skipped, {e.orig}")
+            sessions_skipped += 1
+            continue
+        if archived:
+            print(f"-> Session {scanned_session.id} ({scanned_session.user_id}): archived {archived} events")
+            sessions_compacted += 1
+            events_archived += archived
+
+    print(f"\n--- Compaction Complete. Archived {events_archived} events from {sessions_compacted} sessions. ---")
+    if sessions_skipped:
+        print(f"Skipped {sessions_skipped} sessions after database errors; they will be retried on the next run.")
+
+
+async def main():
+    parser = argparse.ArgumentParser(
+        description="Snapshots long-lived sessions and archives their old events into compressed chunks."
+    )
+    parser.add_argument("--keep-recent", type=int, default=KEEP_RECENT_EVENTS,
+                        help="Number of newest events to keep in the hot events table.")
+    parser.add_argument("--chunk-events", type=int, default=ARCHIVE_CHUNK_EVENTS,
+                        help="Number of events per compressed archive chunk.")
+    parser.add_argument("--interval", type=float, default=None,
+                        help="Keep running and compact every INTERVAL seconds.")
+    args = parser.parse_args()
+
+    print("--- Starting Session Compaction Script ---")
+    if not os.path.exists(DB_URL.replace("sqlite:///", "")):
+        print(f"Database file not found at '{DB_URL}'. Please run `python main.py` first.")
+        return
+
+    # Compaction reads and then writes in one transaction, so it takes the write
+    # lock up front like the chat runtime; a deferred transaction would fail with
+    # "database is locked" whenever a chat append commits in between
+    session_service = create_session_service(DB_URL, PRODUCTION_SQLITE_PROFILE)
+    create_archive_tables(session_service.db_engine)
+    create_scan_indexes(session_service.db_engine)
+
+    while True:
+        await compact_all(session_service, args.keep_recent, args.chunk_events)
+        if args.interval is None:
+            break
+        await asyncio.sleep(args.interval)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
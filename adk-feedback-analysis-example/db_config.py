@@ -0,0 +1,109 @@
+from dataclasses import dataclass, replace
+from typing import Any, Dict, Optional
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import QueuePool
+from google.adk.sessions import DatabaseSessionService
+
+from write_behind import WriteBehindSessionService
+
+
+# --- SQLite Profiles ---
+@dataclass(frozen=True)
+class SqliteProfile:
+    """Connection and PRAGMA settings applied to every SQLite connection of an engine."""
+    # WAL lets readers run alongside the single writer instead of blocking on it
+    journal_mode: str = "WAL"
+    # NORMAL only fsyncs at checkpoints in WAL mode; committed data survives
+    # application crashes, the last transactions may roll back on power loss
+    synchronous: str = "NORMAL"
+    # How long a connection waits for a lock before raising "database is locked"
+    busy_timeout_ms: int = 5000
+    mmap_size: int = 256 * 1024 * 1024
+    # Negative values are KiB, as in `PRAGMA cache_size`
+    cache_size: int = -64 * 1024
+    pool_size: int = 8
+    max_overflow: int = 8
+    # IMMEDIATE takes the write lock when a transaction starts, so read-then-write
+    # transactions (such as `append_event`) wait on busy_timeout instead of
+    # failing when they try to upgrade their lock mid-transaction
+    begin_mode: str = "IMMEDIATE"
+
+
+# The chat runtime reads and then writes in the same transaction
+PRODUCTION_SQLITE_PROFILE = SqliteProfile()
+# Analysis and reporting are mostly read-only and must not hold the write lock while reading
+ANALYSIS_SQLITE_PROFILE = replace(PRODUCTION_SQLITE_PROFILE, begin_mode="DEFERRED")
+
+
+def is_sqlite_url(db_url: str) -> bool:
+    return db_url.startswith("sqlite")
+
+
+def sqlite_engine_options(profile: SqliteProfile) -> Dict[str, Any]:
+    """Returns the `create_engine` keyword arguments for a SQLite profile."""
+    return {
+        "poolclass": QueuePool,
+        "pool_size": profile.pool_size,
+        "max_overflow": profile.max_overflow,
+        "connect_args": {
+            "timeout": profile.busy_timeout_ms / 1000,
+            # Pooled connections are handed to whichever thread checks them out
+            "check_same_thread": False,
+        },
+    }
+
+
+def configure_sqlite_engine(engine: Engine, profile: SqliteProfile) -> Engine:
+    """
+    Applies a profile's PRAGMAs and transaction mode to every connection of `engine`.
+
+    Connections that were opened before the listeners were attached are
+    discarded so that none of them escape the profile.
+    """
+    @event.listens_for(engine, "connect")
+    def _apply_pragmas(dbapi_connection, connection_record):
+        # Disable pysqlite's implicit BEGIN so the "begin" hook below controls it
+        dbapi_connection.isolation_level = None
+        cursor = dbapi_connection.cursor()
+        cursor.execute(f"PRAGMA journal_mode={profile.journal_mode}")
+        cursor.execute(f"PRAGMA synchronous={profile.synchronous}")
+        cursor.execute(f"PRAGMA busy_timeout={profile.busy_timeout_ms}")
+        cursor.execute(f"PRAGMA mmap_size={profile.mmap_size}")
+        cursor.execute(f"PRAGMA cache_size={profile.cache_size}")
+        cursor.close()
+
+    @event.listens_for(engine, "begin")
+    def _begin(connection):
+        connection.exec_driver_sql(f"BEGIN {profile.begin_mode}")
+
+    engine.dispose()
+    return engine
+
+
+# --- Factories ---
+def create_db_engine(db_url: str, profile: Optional[SqliteProfile] = ANALYSIS_SQLITE_PROFILE) -> Engine:
+    """Creates a SQLAlchemy engine, applying the SQLite profile when the URL is SQLite."""
+    if not is_sqlite_url(db_url) or profile is None:
+        return create_engine(db_url)
+    return configure_sqlite_engine(create_engine(db_url, **sqlite_engine_options(profile)), profile)
+
+
+def create_session_service(
+    db_url: str,
+    profile: Optional[SqliteProfile] = PRODUCTION_SQLITE_PROFILE,
+    write_behind: bool = False,
+) -> DatabaseSessionService:
+    """
+    Creates a `DatabaseSessionService`, applying the SQLite profile when the URL is SQLite.
+
+    With `write_behind=True` a `WriteBehindSessionService` is returned, which
+    batches event writes; see its docstring for ordering and durability.
+    """
+    service_class = WriteBehindSessionService if write_behind else DatabaseSessionService
+    if not is_sqlite_url(db_url) or profile is None:
+        return service_class(db_url=db_url)
+    session_service = service_class(db_url=db_url, **sqlite_engine_options(profile))
+    configure_sqlite_engine(session_service.db_engine, profile)
+    return session_service
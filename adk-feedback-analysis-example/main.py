@@ -5,11 +5,12 @@ from dotenv import load_dotenv
 
 from google.adk.agents import Agent
 from google.adk.runners import Runner
-from google.adk.sessions import DatabaseSessionService
 from google.genai import types
 
 # Import the root_agent from our application package
 from agent_app.agent import root_agent
+from db_config import PRODUCTION_SQLITE_PROFILE, create_session_service
+from usage_ledger import UsageLedger, create_ledger_tables
 
 # --- 1. Load Environment Variables ---
 load_dotenv()
@@ -18,9 +19,14 @@ load_dotenv()
 # --- 2. Explicitly Configure the Session Service ---
 # This is the step that `adk web` was doing implicitly.
 # We are creating a service that will store sessions in a local SQLite file.
+# The production profile enables WAL, a busy timeout and connection pooling so
+# the chat runtime and `analysis.py` can use the database at the same time.
 DB_URL = "sqlite:///./sessions.db"
-session_service = DatabaseSessionService(db_url=DB_URL)
-print(f"✅ Persistent session storage configured at: {DB_URL}")
+# Opt-in: set SESSION_WRITE_BEHIND=1 to batch event writes and commit them at
+# the end of each turn instead of once per event.
+WRITE_BEHIND = os.getenv("SESSION_WRITE_BEHIND", "").lower() in ("1", "true", "yes")
+session_service = create_session_service(DB_URL, PRODUCTION_SQLITE_PROFILE, write_behind=WRITE_BEHIND)
+print(f"✅ Persistent session storage configured at: {DB_URL}" + (" (write-behind)" if WRITE_BEHIND else ""))
 
 # --- 3. Explicitly Configure the Runner ---
 # We create a Runner instance, telling it which agent to run and which
@@ -33,6 +39,12 @@ runner = Runner(
 )
 print(f"✅ Runner configured for agent: '{root_agent.name}'")
 
+# Record tokens, latency and cost of every model call, including the
+# specialists', in the `model_usage_ledger` table next to the sessions.
+create_ledger_tables(session_service.db_engine)
+usage_ledger = UsageLedger(session_service.db_engine)
+usage_ledger.attach(root_agent)
+
 
 # --- 4. The Interactive Terminal Loop ---
 async def chat_loop():
@@ -66,12 +78,18 @@ async def chat_loop():
             # This is the core call to the ADK Runner
             print("Agent > ", end="", flush=True)
             final_response_text = ""
-            async for event in runner.run_async(user_id=user_id, session_id=session.id, new_message=user_message):
-                # We'll only print the final text response for a clean chat experience
-                if event.is_final_response() and event.content and event.content.parts:
-                    response_part = event.content.parts[0].text
-                    print(response_part, end="", flush=True)
-                    final_response_text += response_part
+            with usage_ledger.session(APP_NAME, user_id, session.id):
+                async for event in runner.run_async(user_id=user_id, session_id=session.id, new_message=user_message):
+                    # We'll only print the final text response for a clean chat experience
+                    if event.is_final_response() and event.content and event.content.parts:
+                        response_part = event.content.parts[0].text
+                        print(response_part, end="", flush=True)
+                        final_response_text += response_part
+
+            # Persist the whole turn in one transaction before the next prompt
+            if WRITE_BEHIND:
+                await session_service.flush(session)
+            await usage_ledger.flush()
             
             # Print a newline after the agent's full response
             if final_response_text:
@@ -84,6 +102,10 @@ async def chat_loop():
             print(f"\nAn error occurred: {e}")
             continue
 
+    await usage_ledger.flush()
+    if WRITE_BEHIND:
+        await session_service.close()
+
 if __name__ == "__main__":
     try:
         asyncio.run(chat_loop())
@@ -1,101 +1,265 @@
+import math
 import os
-import json
-from sqlalchemy import create_engine, select
-from sqlalchemy.orm import sessionmaker
-from google.adk.sessions.database_session_service import StorageSession
+from typing import Dict, List, Optional, Tuple
+from sqlalchemy import and_, func, inspect, or_, select, tuple_
+from sqlalchemy.orm import Session as DBSession
+
+from db_config import ANALYSIS_SQLITE_PROFILE, create_db_engine
+from analytics_store import ANALYZER_VERSION, SessionAnalytics, SessionModelUsage, SessionSpecialistUsage
 
 # --- Configuration ---
 # This MUST match the configuration used by your other scripts
 APP_NAME = "my_agent_app"
 DB_URL = "sqlite:///./sessions.db"
+PERCENTILES = (0.5, 0.95, 0.99)
+DETAIL_PAGE_SIZE = 50
+
+# All queries read the typed `session_analytics` sidecar table, filtered on
+# its indexed (app_name, analyzer_version) prefix.
+ANALYZED_FILTER = and_(
+    SessionAnalytics.app_name == APP_NAME,
+    SessionAnalytics.analyzer_version == ANALYZER_VERSION,
+)
+
+
+# --- Aggregate Queries ---
+def fetch_summary(db_session: DBSession) -> Dict[str, float]:
+    """Computes count, sum and average of turns and duration in a single query."""
+    stmt = select(
+        func.count().label("total_sessions"),
+        func.coalesce(func.sum(SessionAnalytics.turn_count), 0).label("total_turns"),
+        func.coalesce(func.sum(SessionAnalytics.duration_seconds), 0).label("total_duration_seconds"),
+        func.coalesce(func.avg(SessionAnalytics.turn_count), 0).label("average_turns"),
+        func.coalesce(func.avg(SessionAnalytics.duration_seconds), 0).label("average_duration_seconds"),
+    ).where(ANALYZED_FILTER)
+    return dict(db_session.execute(stmt).one()._mapping)
+
+
+def fetch_percentiles(db_session: DBSession, column, total: int) -> Dict[float, float]:
+    """
+    Computes nearest-rank percentiles of an analytics column inside the database.
+
+    A ROW_NUMBER window ranks the values and only the rows at the requested
+    ranks are returned, which works the same on SQLite and Postgres.
+    """
+    if total == 0:
+        return {p: 0.0 for p in PERCENTILES}
+
+    ranked = select(
+        column.label("value"),
+        func.row_number().over(order_by=column).label("rank"),
+    ).where(ANALYZED_FILTER).subquery()
+
+    # Nearest-rank definition: the smallest value with at least p * n values at or below it
+    ranks = {p: max(1, math.ceil(round(p * total, 6))) for p in PERCENTILES}
+    stmt = select(ranked.c.rank, ranked.c.value).where(ranked.c.rank.in_(set(ranks.values())))
+    values_by_rank = {rank: value for rank, value in db_session.execute(stmt)}
+    return {p: values_by_rank[rank] for p, rank in ranks.items()}
+
+
+def fetch_specialist_usage(db_session: DBSession) -> List[Tuple[str, int]]:
+    """Counts in how many sessions each specialist was used, grouped in the database."""
+    stmt = (
+        select(SessionSpecialistUsage.specialist, func.count().label("sessions"))
+        .where(
+            SessionSpecialistUsage.app_name == APP_NAME,
+            SessionSpecialistUsage.analyzer_version == ANALYZER_VERSION,
+        )
+        .group_by(SessionSpecialistUsage.specialist)
+        .order_by(func.count().desc(), SessionSpecialistUsage.specialist)
+    )
+    return [(name, count) for name, count in db_session.execute(stmt)]
+
+
+def fetch_model_usage(db_session: DBSession) -> List[Dict[str, float]]:
+    """Sums tokens, cost and cache/routing savings per model over all analysed sessions."""
+    stmt = (
+        select(
+            SessionModelUsage.model,
+            func.count().label("sessions"),
+            func.sum(SessionModelUsage.calls).label("calls"),
+            func.sum(SessionModelUsage.prompt_tokens).label("prompt_tokens"),
+            func.sum(SessionModelUsage.cached_tokens).label("cached_tokens"),
+            func.sum(SessionModelUsage.output_tokens).label("output_tokens"),
+            func.sum(SessionModelUsage.cost_usd).label("cost_usd"),
+            func.sum(SessionModelUsage.cache_hits).label("cache_hits"),
+            func.sum(SessionModelUsage.cache_saved_usd).label("cache_saved_usd"),
+            func.sum(SessionModelUsage.routing_saved_usd).label("routing_saved_usd"),
+        )
+        .where(
+            SessionModelUsage.app_name == APP_NAME,
+            SessionModelUsage.analyzer_version == ANALYZER_VERSION,
+        )
+        .group_by(SessionModelUsage.model)
+        .order_by(func.sum(SessionModelUsage.cost_usd).desc(), SessionModelUsage.model)
+    )
+    return [dict(row._mapping) for row in db_session.execute(stmt)]
+
+
+def fetch_detail_page(
+    db_session: DBSession, after: Optional[Tuple[str, str]] = None, limit: int = DETAIL_PAGE_SIZE
+) -> List[Tuple[SessionAnalytics, List[str], Tuple[int, float]]]:
+    """
+    Returns one page of per-session detail rows, ordered by (user_id, session_id).
+
+    Pass the (user_id, session_id) of the last row of the previous page as
+    `after` to fetch the next page. Specialists and (tokens, cost) totals for
+    the page are fetched with one extra query each, keyed on the page's sessions.
+    """
+    stmt = select(SessionAnalytics).where(ANALYZED_FILTER)
+    if after is not None:
+        last_user_id, last_session_id = after
+        stmt = stmt.where(or_(
+            SessionAnalytics.user_id > last_user_id,
+            and_(SessionAnalytics.user_id == last_user_id, SessionAnalytics.session_id > last_session_id),
+        ))
+    stmt = stmt.order_by(SessionAnalytics.user_id, SessionAnalytics.session_id).limit(limit)
+    rows = db_session.execute(stmt).scalars().all()
+    if not rows:
+        return []
+
+    specialists: Dict[Tuple[str, str], List[str]] = {}
+    usage_stmt = select(
+        SessionSpecialistUsage.user_id, SessionSpecialistUsage.session_id, SessionSpecialistUsage.specialist
+    ).where(
+        SessionSpecialistUsage.app_name == APP_NAME,
+        SessionSpecialistUsage.analyzer_version == ANALYZER_VERSION,
+        tuple_(SessionSpecialistUsage.user_id, SessionSpecialistUsage.session_id).in_(
+            [(row.user_id, row.session_id) for row in rows]
+        ),
+    )
+    for user_id, session_id, specialist in db_session.execute(usage_stmt):
+        specialists.setdefault((user_id, session_id), []).append(specialist)
+
+    cost_stmt = select(
+        SessionModelUsage.user_id,
+        SessionModelUsage.session_id,
+        func.sum(SessionModelUsage.prompt_tokens + SessionModelUsage.output_tokens).label("total_tokens"),
+        func.sum(SessionModelUsage.cost_usd).label("cost_usd"),
+    ).where(
+        SessionModelUsage.app_name == APP_NAME,
+        SessionModelUsage.analyzer_version == ANALYZER_VERSION,
+        tuple_(SessionModelUsage.user_id, SessionModelUsage.session_id).in_(
+            [(row.user_id, row.session_id) for row in rows]
+        ),
+    ).group_by(SessionModelUsage.user_id, SessionModelUsage.session_id)
+    costs = {
+        (user_id, session_id): (int(total_tokens), cost_usd)
+        for user_id, session_id, total_tokens, cost_usd in db_session.execute(cost_stmt)
+    }
+
+    return [
+        (
+            row,
+            specialists.get((row.user_id, row.session_id), []),
+            costs.get((row.user_id, row.session_id), (0, 0.0)),
+        )
+        for row in rows
+    ]
+
 
 def main():
     """
-    Connects to the session database, extracts analysis data,
-    calculates aggregate metrics, and prints a report to the terminal.
+    Connects to the session database, computes aggregate metrics in SQL,
+    and prints a report to the terminal.
     """
     print("--- Starting Session Analysis Reporting Script ---")
 
     db_file_path = DB_URL.replace("sqlite:///", "")
-    if not os.path.exists(db_file_path):
-        print(f"Database file not found at '{db_file_path}'. Please run `python main.py` and `python analysis_script.py` first.")
+    if DB_URL.startswith("sqlite") and not os.path.exists(db_file_path):
+        print(f"Database file not found at '{db_file_path}'. Please run `python main.py` and `python analysis.py` first.")
         return
 
-    # --- 1. Connect to the Database and Fetch Analyzed Sessions ---
-    engine = create_engine(DB_URL)
-    DBSession = sessionmaker(bind=engine)
-    db_session = DBSession()
-
-    # Query for all sessions of the app that have the analysis key in their state
-    # We use SQLAlchemy's JSON capabilities to query inside the state field.
-    # The ->> operator extracts a JSON field as text.
-    stmt = select(StorageSession).where(
-        StorageSession.app_name == APP_NAME,
-        StorageSession.state.op('->>')('post_analysis_v1').isnot(None)
-    )
-    
-    analyzed_sessions = db_session.execute(stmt).scalars().all()
-    db_session.close()
-
-    if not analyzed_sessions:
-        print("No analyzed sessions found. Please run the `analysis_script.py` first.")
+    # --- 1. Connect to the Database ---
+    engine = create_db_engine(DB_URL, ANALYSIS_SQLITE_PROFILE)
+    if not inspect(engine).has_table(SessionAnalytics.__tablename__):
+        print("No analytics table found. Please run `python analysis.py` (or `python analytics_store.py backfill`) first.")
+        return
+    if not inspect(engine).has_table(SessionModelUsage.__tablename__):
+        print("No usage table found. Please run `python analysis.py` once more to create it.")
         return
 
-    print(f"\nFound {len(analyzed_sessions)} analyzed sessions to report on.")
-
-    # --- 2. Extract Analysis Data from Each Session ---
-    all_analysis_data = []
-    for session_record in analyzed_sessions:
-        # The 'state' column is a dictionary (or JSONB). We can access it directly.
-        analysis_data = session_record.state.get("post_analysis_v1")
-        if analysis_data:
-            # Add session_id for context in the report
-            analysis_data['session_id'] = session_record.id
-            all_analysis_data.append(analysis_data)
-
-    # --- 3. Calculate Aggregate Metrics ---
-    total_sessions = len(all_analysis_data)
-    total_turns = sum(data['turn_count'] for data in all_analysis_data)
-    total_duration_seconds = sum(data['duration_seconds'] for data in all_analysis_data)
-
-    average_turns_per_session = round(total_turns / total_sessions, 2) if total_sessions > 0 else 0
-    average_duration_per_session = round(total_duration_seconds / total_sessions, 2) if total_sessions > 0 else 0
-
-    # Specialist usage frequency
-    specialist_usage = {}
-    for data in all_analysis_data:
-        for specialist in data.get('used_specialists', []):
-            specialist_usage[specialist] = specialist_usage.get(specialist, 0) + 1
-
-    # --- 4. Print the Report to the Terminal ---
-    print("\n" + "="*50)
-    print(" " * 15 + "SESSION ANALYSIS REPORT")
-    print("="*50)
-    print(f"Application Name:      {APP_NAME}")
-    print(f"Total Analyzed Sessions: {total_sessions}")
-    print("-" * 50)
-    print("\nAggregate Metrics:")
-    print(f"  - Average Turns per Session:    {average_turns_per_session}")
-    print(f"  - Average Duration per Session: {average_duration_per_session:.2f} seconds")
-    
-    if specialist_usage:
-        print("\nSpecialist Agent Usage:")
-        for specialist, count in specialist_usage.items():
-            print(f"  - {specialist:<25} used in {count} session(s)")
-    
-    print("\n" + "="*50)
-    print(" " * 17 + "DETAILED SESSION DATA")
-    print("="*50)
-    # Print a table header
-    print(f"{'Session ID':<38} | {'Turns':<6} | {'Duration (s)':<13} | {'Used Specialists'}")
-    print("-" * 80)
-    for data in all_analysis_data:
-        specialists_str = ", ".join(data.get('used_specialists', ['None']))
-        print(f"{data['session_id']:<38} | {data['turn_count']:<6} | {data['duration_seconds']:<13.2f} | {specialists_str}")
-    
+    with DBSession(engine) as db_session:
+        # --- 2. Compute Aggregate Metrics in the Database ---
+        # Only summary rows come back; the session states never leave the database.
+        summary = fetch_summary(db_session)
+        total_sessions = summary["total_sessions"]
+
+        if not total_sessions:
+            print("No analyzed sessions found. Please run the `analysis.py` first.")
+            return
+
+        print(f"\nFound {total_sessions} analyzed sessions to report on.")
+
+        turn_percentiles = fetch_percentiles(db_session, SessionAnalytics.turn_count, total_sessions)
+        duration_percentiles = fetch_percentiles(db_session, SessionAnalytics.duration_seconds, total_sessions)
+        specialist_usage = fetch_specialist_usage(db_session)
+        model_usage = fetch_model_usage(db_session)
+
+        # --- 3. Print the Report to the Terminal ---
+        print("\n" + "="*50)
+        print(" " * 15 + "SESSION ANALYSIS REPORT")
+        print("="*50)
+        print(f"Application Name:      {APP_NAME}")
+        print(f"Total Analyzed Sessions: {total_sessions}")
+        print("-" * 50)
+        print("\nAggregate Metrics:")
+        print(f"  - Total Turns:                  {int(summary['total_turns'])}")
+        print(f"  - Total Duration:               {summary['total_duration_seconds']:.2f} seconds")
+        print(f"  - Average Turns per Session:    {round(summary['average_turns'], 2)}")
+        print(f"  - Average Duration per Session: {summary['average_duration_seconds']:.2f} seconds")
+
+        print("\nPercentiles:")
+        print(f"  {'':<10} | {'p50':>8} | {'p95':>8} | {'p99':>8}")
+        print(f"  {'Turns':<10} | " + " | ".join(f"{turn_percentiles[p]:>8.0f}" for p in PERCENTILES))
+        print(f"  {'Duration':<10} | " + " | ".join(f"{duration_percentiles[p]:>8.2f}" for p in PERCENTILES))
+
+        if specialist_usage:
+            print("\nSpecialist Agent Usage:")
+            for specialist, count in specialist_usage:
+                print(f"  - {specialist:<25} used in {count} session(s)")
+
+        if model_usage:
+            # Cached prompt tokens are part of the prompt count, billed at a lower rate
+            prompt_tokens = sum(usage["prompt_tokens"] for usage in model_usage)
+            cached_tokens = sum(usage["cached_tokens"] for usage in model_usage)
+            output_tokens = sum(usage["output_tokens"] for usage in model_usage)
+            total_tokens = prompt_tokens + output_tokens
+            total_cost = sum(usage["cost_usd"] for usage in model_usage)
+            cache_hits = sum(usage["cache_hits"] for usage in model_usage)
+            print("\nToken Usage & Cost:")
+            print(f"  - Total Tokens:                 {total_tokens} (prompt {prompt_tokens}, cached {cached_tokens}, output {output_tokens})")
+            print(f"  - Total Cost:                   ${total_cost:.4f}")
+            print(f"  - Average Tokens per Session:   {total_tokens / total_sessions:.0f}")
+            print(f"  - Average Cost per Session:     ${total_cost / total_sessions:.4f}")
+            print(f"  - Saved by Caching:             ${sum(usage['cache_saved_usd'] for usage in model_usage):.4f} ({cache_hits} cache hit(s))")
+            print(f"  - Saved by Routing:             ${sum(usage['routing_saved_usd'] for usage in model_usage):.4f}")
+            print(f"\n  {'Model':<20} | {'Calls':>6} | {'Tokens':>10} | {'Cost ($)':>10}")
+            for usage in model_usage:
+                model_tokens = usage["prompt_tokens"] + usage["output_tokens"]
+                print(f"  {usage['model']:<20} | {usage['calls']:>6} | {model_tokens:>10} | {usage['cost_usd']:>10.4f}")
+
+        print("\n" + "="*50)
+        print(" " * 17 + "DETAILED SESSION DATA")
+        print("="*50)
+        # Print a table header
+        print(f"{'Session ID':<38} | {'Turns':<6} | {'Duration (s)':<13} | {'Tokens':<8} | {'Cost ($)':<9} | {'Used Specialists'}")
+        print("-" * 104)
+
+        # Stream the detail rows page by page with keyset pagination
+        cursor = None
+        while True:
+            page = fetch_detail_page(db_session, after=cursor)
+            for row, specialists, (tokens, cost) in page:
+                specialists_str = ", ".join(specialists) or "None"
+                print(f"{row.session_id:<38} | {row.turn_count:<6} | {row.duration_seconds:<13.2f} | {tokens:<8} | {cost:<9.4f} | {specialists_str}")
+            if len(page) < DETAIL_PAGE_SIZE:
+                break
+            cursor = (page[-1][0].user_id, page[-1][0].session_id)
+
     print("\n" + "="*50)
     print("--- End of Report ---")
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,201 @@
+import zlib
+from datetime import datetime
+from typing import AsyncIterator, Dict, List
+
+from sqlalchemy import DateTime, Integer, LargeBinary, String, delete, func, inspect, select, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column
+from google.adk.events import Event
+from google.adk.sessions import DatabaseSessionService
+from google.adk.sessions.database_session_service import (
+    DEFAULT_MAX_KEY_LENGTH,
+    PreciseTimestamp,
+    StorageEvent,
+    StorageSession,
+)
+
+# --- Configuration ---
+# Events kept in the hot `events` table after compaction
+KEEP_RECENT_EVENTS = 200
+# Events stored per compressed archive chunk; one chunk is decoded at a time
+ARCHIVE_CHUNK_EVENTS = 500
+
+
+# --- Schema ---
+class Base(DeclarativeBase):
+    """Base class for the snapshot and archive tables, kept apart from ADK's session schema."""
+    pass
+
+
+class SessionSnapshot(Base):
+    """
+    The compaction boundary of a session.
+
+    Records which events were moved out of the hot table. The state is not
+    copied here: ADK already keeps the current session state materialised
+    on the session row, so loading a session never replays events.
+    """
+    __tablename__ = "session_snapshots"
+
+    app_name: Mapped[str] = mapped_column(String(DEFAULT_MAX_KEY_LENGTH), primary_key=True)
+    user_id: Mapped[str] = mapped_column(String(DEFAULT_MAX_KEY_LENGTH), primary_key=True)
+    session_id: Mapped[str] = mapped_column(String(DEFAULT_MAX_KEY_LENGTH), primary_key=True)
+
+    archived_through: Mapped[datetime] = mapped_column(PreciseTimestamp)
+    archived_event_count: Mapped[int] = mapped_column(Integer, default=0)
+    chunk_count: Mapped[int] = mapped_column(Integer, default=0)
+    snapshot_time: Mapped[datetime] = mapped_column(DateTime(), default=func.now(), onupdate=func.now())
+
+
+class ArchivedEventChunk(Base):
+    """A zlib-compressed block of consecutive archived events of one session."""
+    __tablename__ = "archived_event_chunks"
+
+    app_name: Mapped[str] = mapped_column(String(DEFAULT_MAX_KEY_LENGTH), primary_key=True)
+    user_id: Mapped[str] = mapped_column(String(DEFAULT_MAX_KEY_LENGTH), primary_key=True)
+    session_id: Mapped[str] = mapped_column(String(DEFAULT_MAX_KEY_LENGTH), primary_key=True)
+    chunk_index: Mapped[int] = mapped_column(Integer, primary_key=True)
+
+    first_timestamp: Mapped[datetime] = mapped_column(PreciseTimestamp)
+    last_timestamp: Mapped[datetime] = mapped_column(PreciseTimestamp)
+    event_count: Mapped[int] = mapped_column(Integer)
+    # JSON lines of `Event.model_dump_json()`, compressed with zlib
+    payload: Mapped[bytes] = mapped_column(LargeBinary)
+
+
+# Engines known to have the archive tables; tables are never dropped, so only positives are cached
+_engines_with_archive: Dict[int, bool] = {}
+
+
+def create_archive_tables(engine: Engine) -> None:
+    """Creates the snapshot and archive tables if they do not exist yet."""
+    Base.metadata.create_all(engine)
+
+    # Earlier versions copied the session state into every snapshot; nothing read it
+    columns = {column["name"] for column in inspect(engine).get_columns(SessionSnapshot.__tablename__)}
+    if "state" in columns:
+        with engine.begin() as connection:
+            connection.execute(text(f"ALTER TABLE {SessionSnapshot.__tablename__} DROP COLUMN state"))
+    _engines_with_archive[id(engine)] = True
+
+
+def has_archive_tables(engine: Engine) -> bool:
+    if id(engine) not in _engines_with_archive:
+        if not inspect(engine).has_table(SessionSnapshot.__tablename__):
+            return False
+        _engines_with_archive[id(engine)] = True
+    return True
+
+
+def encode_events(events: List[Event]) -> bytes:
+    lines = "\n".join(event.model_dump_json(exclude_none=True) for event in events)
+    return zlib.compress(lines.encode("utf-8"))
+
+
+def decode_events(payload: bytes) -> List[Event]:
+    lines = zlib.decompress(payload).decode("utf-8").splitlines()
+    return [Event.model_validate_json(line) for line in lines]
+
+
+# --- Compaction ---
+async def compact_session(
+    session_service: DatabaseSessionService,
+    app_name: str,
+    user_id: str,
+    session_id: str,
+    keep_recent: int = KEEP_RECENT_EVENTS,
+    chunk_events: int = ARCHIVE_CHUNK_EVENTS,
+) -> int:
+    """
+    Moves all but the `keep_recent` newest events of a session into compressed archive chunks.
+
+    Archiving, deleting the hot rows and updating the snapshot happen in one
+    transaction, so readers see either the old layout or the new one. The
+    transaction reads before it writes, so on SQLite `session_service` should
+    begin transactions IMMEDIATE (`PRODUCTION_SQLITE_PROFILE`).
+    Returns the number of events archived.
+    """
+    event_filter = (
+        StorageEvent.app_name == app_name,
+        StorageEvent.user_id == user_id,
+        StorageEvent.session_id == session_id,
+    )
+
+    with session_service.database_session_factory() as db_session:
+        session_exists = db_session.scalar(select(StorageSession.id).where(
+            StorageSession.app_name == app_name,
+            StorageSession.user_id == user_id,
+            StorageSession.id == session_id,
+        ))
+        if session_exists is None:
+            return 0
+
+        hot_count = db_session.scalar(select(func.count()).select_from(StorageEvent).where(*event_filter))
+        to_archive = hot_count - keep_recent
+        if to_archive <= 0:
+            return 0
+
+        snapshot = db_session.get(SessionSnapshot, (app_name, user_id, session_id))
+        chunk_index = snapshot.chunk_count if snapshot else 0
+
+        archived = 0
+        while archived < to_archive:
+            storage_events = db_session.execute(
+                select(StorageEvent)
+                .where(*event_filter)
+                .order_by(StorageEvent.timestamp, StorageEvent.id)
+                .limit(min(chunk_events, to_archive - archived))
+            ).scalars().all()
+
+            db_session.add(ArchivedEventChunk(
+                app_name=app_name,
+                user_id=user_id,
+                session_id=session_id,
+                chunk_index=chunk_index,
+                first_timestamp=storage_events[0].timestamp,
+                last_timestamp=storage_events[-1].timestamp,
+                event_count=len(storage_events),
+                payload=encode_events([storage_event.to_event() for storage_event in storage_events]),
+            ))
+            db_session.execute(delete(StorageEvent).where(
+                *event_filter, StorageEvent.id.in_([storage_event.id for storage_event in storage_events])
+            ))
+            archived_through = storage_events[-1].timestamp
+            chunk_index += 1
+            archived += len(storage_events)
+
+        if snapshot is None:
+            snapshot = SessionSnapshot(app_name=app_name, user_id=user_id, session_id=session_id, archived_event_count=0)
+            db_session.add(snapshot)
+        snapshot.archived_through = archived_through
+        snapshot.archived_event_count += archived
+        snapshot.chunk_count = chunk_index
+        db_session.commit()
+        return archived
+
+
+# --- Archive Reads ---
+async def iter_archived_events(
+    session_service: DatabaseSessionService, app_name: str, user_id: str, session_id: str
+) -> AsyncIterator[Event]:
+    """Lazily yields a session's archived events, decompressing one chunk at a time."""
+    if not has_archive_tables(session_service.db_engine):
+        return
+
+    next_chunk = 0
+    while True:
+        with session_service.database_session_factory() as db_session:
+            chunk = db_session.execute(
+                select(ArchivedEventChunk.chunk_index, ArchivedEventChunk.payload).where(
+                    ArchivedEventChunk.app_name == app_name,
+                    ArchivedEventChunk.user_id == user_id,
+                    ArchivedEventChunk.session_id == session_id,
+                    ArchivedEventChunk.chunk_index >= next_chunk,
+                ).order_by(ArchivedEventChunk.chunk_index).limit(1)
+            ).first()
+
+        if chunk is None:
+            return
+        next_chunk = chunk.chunk_index + 1
+        for event in decode_events(chunk.payload):
+            yield event
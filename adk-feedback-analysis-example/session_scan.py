@@ -0,0 +1,174 @@
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, AsyncIterator, Dict, Iterable, Optional
+
+from sqlalchemy import Index, and_, exists, or_, select
+from sqlalchemy.engine import Engine
+from google.adk.events import Event
+from google.adk.sessions import DatabaseSessionService
+from google.adk.sessions.database_session_service import StorageEvent, StorageSession
+
+from session_archive import iter_archived_events
+
+# --- Configuration ---
+# Page sizes bound how many rows are held in memory at any one time.
+SESSION_PAGE_SIZE = 200
+EVENT_PAGE_SIZE = 500
+
+# ADK's primary key on `events` starts with the event id, so per-session reads
+# ordered by time would scan and sort the whole table without this index
+EVENTS_BY_SESSION_INDEX = Index(
+    "ix_events_session_timestamp",
+    StorageEvent.app_name,
+    StorageEvent.user_id,
+    StorageEvent.session_id,
+    StorageEvent.timestamp,
+    StorageEvent.id,
+)
+
+
+def create_scan_indexes(engine: Engine) -> None:
+    """Creates the per-session event index used by scans, compaction and freshness checks."""
+    EVENTS_BY_SESSION_INDEX.create(engine, checkfirst=True)
+
+
+@dataclass
+class ScannedSession:
+    """A lightweight session handle whose events are streamed on demand."""
+    session_service: DatabaseSessionService = field(repr=False)
+    app_name: str
+    user_id: str
+    id: str
+    last_update_time: float
+    # Only loaded when the scan asks for it with `include_state=True`
+    state: Optional[Dict[str, Any]] = None
+
+    def events(self, page_size: int = EVENT_PAGE_SIZE, include_archived: bool = True) -> AsyncIterator[Event]:
+        """Streams this session's events in chronological order, including compacted ones by default."""
+        if include_archived:
+            return iter_session_history(
+                self.session_service, self.app_name, self.user_id, self.id, page_size=page_size
+            )
+        return iter_session_events(
+            self.session_service, self.app_name, self.user_id, self.id, page_size=page_size
+        )
+
+
+# --- Session Scan ---
+async def iter_sessions(
+    session_service: DatabaseSessionService,
+    app_name: str,
+    user_ids: Optional[Iterable[str]] = None,
+    updated_after: Optional[float] = None,
+    page_size: int = SESSION_PAGE_SIZE,
+    include_state: bool = False,
+) -> AsyncIterator[ScannedSession]:
+    """
+    Yields every session of an app across all users.
+
+    Sessions are paged with keyset pagination on (user_id, id), so each query
+    is an index range scan on the primary key and at most `page_size` rows are
+    held in memory, however large the database grows. The state JSON is only
+    read with `include_state=True`, so scans that do not need it stay small.
+
+    `updated_after` keeps sessions whose state changed or that gained an event
+    after that time. ADK only moves `update_time` on state changes, so new
+    events are checked separately (on the index from `create_scan_indexes`).
+    """
+    filters = [StorageSession.app_name == app_name]
+    if user_ids is not None:
+        filters.append(StorageSession.user_id.in_(list(user_ids)))
+    if updated_after is not None:
+        updated_after_time = datetime.fromtimestamp(updated_after)
+        filters.append(or_(
+            StorageSession.update_time > updated_after_time,
+            exists().where(
+                StorageEvent.app_name == StorageSession.app_name,
+                StorageEvent.user_id == StorageSession.user_id,
+                StorageEvent.session_id == StorageSession.id,
+                StorageEvent.timestamp > updated_after_time,
+            ),
+        ))
+
+    last_key = None
+    while True:
+        columns = [StorageSession.user_id, StorageSession.id, StorageSession.update_time]
+        if include_state:
+            columns.append(StorageSession.state)
+        stmt = select(*columns).where(*filters)
+        if last_key is not None:
+            last_user_id, last_session_id = last_key
+            stmt = stmt.where(or_(
+                StorageSession.user_id > last_user_id,
+                and_(StorageSession.user_id == last_user_id, StorageSession.id > last_session_id),
+            ))
+        stmt = stmt.order_by(StorageSession.user_id, StorageSession.id).limit(page_size)
+
+        with session_service.database_session_factory() as db_session:
+            rows = db_session.execute(stmt).all()
+
+        for row in rows:
+            yield ScannedSession(
+                session_service=session_service,
+                app_name=app_name,
+                user_id=row.user_id,
+                id=row.id,
+                last_update_time=row.update_time.timestamp(),
+                state=(row.state or {}) if include_state else None,
+            )
+
+        if len(rows) < page_size:
+            return
+        last_key = (rows[-1].user_id, rows[-1].id)
+
+
+async def iter_session_events(
+    session_service: DatabaseSessionService,
+    app_name: str,
+    user_id: str,
+    session_id: str,
+    page_size: int = EVENT_PAGE_SIZE,
+) -> AsyncIterator[Event]:
+    """Streams a session's events in (timestamp, id) order, one page at a time."""
+    filters = [
+        StorageEvent.app_name == app_name,
+        StorageEvent.user_id == user_id,
+        StorageEvent.session_id == session_id,
+    ]
+
+    last_key = None
+    while True:
+        stmt = select(StorageEvent).where(*filters)
+        if last_key is not None:
+            last_timestamp, last_event_id = last_key
+            stmt = stmt.where(or_(
+                StorageEvent.timestamp > last_timestamp,
+                and_(StorageEvent.timestamp == last_timestamp, StorageEvent.id > last_event_id),
+            ))
+        stmt = stmt.order_by(StorageEvent.timestamp, StorageEvent.id).limit(page_size)
+
+        with session_service.database_session_factory() as db_session:
+            storage_events = db_session.execute(stmt).scalars().all()
+            events = [storage_event.to_event() for storage_event in storage_events]
+            if storage_events:
+                last_key = (storage_events[-1].timestamp, storage_events[-1].id)
+
+        for event in events:
+            yield event
+
+        if len(events) < page_size:
+            return
+
+
+async def iter_session_history(
+    session_service: DatabaseSessionService,
+    app_name: str,
+    user_id: str,
+    session_id: str,
+    page_size: int = EVENT_PAGE_SIZE,
+) -> AsyncIterator[Event]:
+    """Streams a session's full history: archived events first, then the hot tail."""
+    async for event in iter_archived_events(session_service, app_name, user_id, session_id):
+        yield event
+    async for event in iter_session_events(session_service, app_name, user_id, session_id, page_size=page_size):
+        yield event
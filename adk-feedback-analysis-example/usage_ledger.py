@@ -0,0 +1,293 @@
+import asyncio
+import logging
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from sqlalchemy import Boolean, DateTime, Float, Index, Integer, String, cast, func, insert, inspect, select, tuple_
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column
+from sqlalchemy.orm import Session as DBSession
+from google.adk.agents import BaseAgent, LlmAgent
+from google.adk.agents.callback_context import CallbackContext
+from google.adk.models.llm_request import LlmRequest
+from google.adk.models.llm_response import LlmResponse
+from google.adk.sessions.database_session_service import DEFAULT_MAX_KEY_LENGTH
+from google.adk.tools.agent_tool import AgentTool
+from google.genai import types
+
+# --- Configuration ---
+# USD per million tokens as (input, cached input, output). List prices at the
+# time of writing; adjust them to your contract. Unknown models cost nothing.
+MODEL_PRICING: Dict[str, Tuple[float, float, float]] = {
+    "gemini-2.0-flash": (0.10, 0.025, 0.40),
+    "gemini-2.5-flash": (0.30, 0.075, 2.50),
+    "gemini-2.5-pro": (1.25, 0.31, 10.00),
+}
+# Key under `LlmResponse.custom_metadata` where model wrappers (CachingLlm,
+# RoutingLlm, RetryableLlm) report how a call was served:
+#   model           the model that actually answered
+#   cache_hit       True when the response came from the cache
+#   saved_usage     usage_metadata of the original call a cache hit replayed
+#   saved_model     the model that original call went to
+#   baseline_model  the model the request would have used without routing
+#   retry_attempts  attempts needed, including the successful one
+WRAPPER_METADATA_KEY = "usage_ledger"
+# Start times of calls that never completed (the model raised) are dropped after this long
+MAX_CALL_SECONDS = 600
+
+logger = logging.getLogger(__name__)
+
+
+# --- Schema ---
+class Base(DeclarativeBase):
+    """Base class for the usage ledger, kept apart from ADK's session schema."""
+    pass
+
+
+class ModelUsage(Base):
+    """One row per model call: tokens, latency, cost and how the call was served."""
+    __tablename__ = "model_usage_ledger"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    app_name: Mapped[str] = mapped_column(String(DEFAULT_MAX_KEY_LENGTH))
+    user_id: Mapped[str] = mapped_column(String(DEFAULT_MAX_KEY_LENGTH))
+    session_id: Mapped[str] = mapped_column(String(DEFAULT_MAX_KEY_LENGTH))
+    invocation_id: Mapped[str] = mapped_column(String(DEFAULT_MAX_KEY_LENGTH))
+    agent_name: Mapped[str] = mapped_column(String(DEFAULT_MAX_KEY_LENGTH))
+    model: Mapped[str] = mapped_column(String(DEFAULT_MAX_KEY_LENGTH))
+
+    prompt_tokens: Mapped[int] = mapped_column(Integer, default=0)
+    cached_tokens: Mapped[int] = mapped_column(Integer, default=0)
+    output_tokens: Mapped[int] = mapped_column(Integer, default=0)
+    latency_ms: Mapped[float] = mapped_column(Float)
+    cost_usd: Mapped[float] = mapped_column(Float, default=0.0)
+
+    cache_hit: Mapped[bool] = mapped_column(Boolean, default=False)
+    cache_saved_usd: Mapped[float] = mapped_column(Float, default=0.0)
+    baseline_model: Mapped[Optional[str]] = mapped_column(String(DEFAULT_MAX_KEY_LENGTH), nullable=True)
+    routing_saved_usd: Mapped[float] = mapped_column(Float, default=0.0)
+    retry_attempts: Mapped[int] = mapped_column(Integer, default=1)
+
+    created_at: Mapped[datetime] = mapped_column(DateTime(), default=func.now())
+
+    __table_args__ = (
+        Index("ix_model_usage_ledger_session", "app_name", "user_id", "session_id"),
+    )
+
+
+def create_ledger_tables(engine: Engine) -> None:
+    """Creates the usage ledger table if it does not exist yet."""
+    Base.metadata.create_all(engine)
+
+
+def has_ledger_table(engine: Engine) -> bool:
+    return inspect(engine).has_table(ModelUsage.__tablename__)
+
+
+# --- Pricing ---
+def token_counts(usage: Optional[types.GenerateContentResponseUsageMetadata]) -> Tuple[int, int, int]:
+    """Returns (prompt, cached, output) tokens; thinking tokens are billed as output."""
+    if usage is None:
+        return 0, 0, 0
+    output_tokens = (usage.candidates_token_count or 0) + (usage.thoughts_token_count or 0)
+    return usage.prompt_token_count or 0, usage.cached_content_token_count or 0, output_tokens
+
+
+def usage_cost(model: Optional[str], prompt_tokens: int, cached_tokens: int, output_tokens: int) -> float:
+    """Prices a call in USD; cached prompt tokens are billed at the cached-input rate."""
+    input_price, cached_price, output_price = MODEL_PRICING.get(model or "", (0.0, 0.0, 0.0))
+    return (
+        (prompt_tokens - cached_tokens) * input_price
+        + cached_tokens * cached_price
+        + output_tokens * output_price
+    ) / 1_000_000
+
+
+# --- Recording ---
+# (app_name, user_id, session_id) that model calls of the current turn are billed to
+_ledger_session: ContextVar[Optional[Tuple[str, str, str]]] = ContextVar("usage_ledger_session", default=None)
+
+
+class UsageLedger:
+    """
+    Records one ledger row per model call of an agent tree and writes them in batches.
+
+    `attach()` registers model callbacks on every LLM agent, including
+    specialists behind AgentTools. Those run in a throwaway in-memory session,
+    so calls are billed to the session set with `session()`; wrap each turn
+    in it. Calls made outside a `session()` block are not recorded. Rows are
+    buffered in memory until `flush()`, which the chat loop calls once per turn.
+    """
+
+    def __init__(self, engine: Engine):
+        self.engine = engine
+        self._pending: List[Dict[str, Any]] = []
+        # (invocation_id, agent_name) -> (start time, requested model)
+        self._started: Dict[Tuple[str, str], Tuple[float, str]] = {}
+        self._warned_unscoped = False
+
+    def attach(self, agent: BaseAgent) -> None:
+        """Adds the ledger callbacks to `agent` and every agent reachable from it."""
+        if isinstance(agent, LlmAgent):
+            # Start timing last and record first, so other callbacks that
+            # short-circuit or rewrite the response do not skew the ledger
+            agent.before_model_callback = agent.canonical_before_model_callbacks + [self.before_model]
+            agent.after_model_callback = [self.after_model] + agent.canonical_after_model_callbacks
+        children = [tool.agent for tool in getattr(agent, "tools", []) if isinstance(tool, AgentTool)]
+        children.extend(agent.sub_agents)
+        for child in children:
+            self.attach(child)
+
+    @contextmanager
+    def session(self, app_name: str, user_id: str, session_id: str) -> Iterator[None]:
+        """Bills every model call made inside the block to the given session."""
+        token = _ledger_session.set((app_name, user_id, session_id))
+        try:
+            yield
+        finally:
+            _ledger_session.reset(token)
+
+    def before_model(self, callback_context: CallbackContext, llm_request: LlmRequest) -> None:
+        if _ledger_session.get() is None:
+            if not self._warned_unscoped:
+                logger.warning("Model call outside UsageLedger.session(); it is not recorded.")
+                self._warned_unscoped = True
+            return None
+        key = (callback_context.invocation_id, callback_context.agent_name)
+        self._started[key] = (time.perf_counter(), llm_request.model or "")
+        return None
+
+    def after_model(self, callback_context: CallbackContext, llm_response: LlmResponse) -> None:
+        # Streamed chunks carry no usage; only the final response is billed
+        if llm_response.partial:
+            return None
+        started = self._started.pop((callback_context.invocation_id, callback_context.agent_name), None)
+        if started is None:
+            return None
+        started_at, requested_model = started
+
+        outcome = (llm_response.custom_metadata or {}).get(WRAPPER_METADATA_KEY, {})
+        model = outcome.get("model") or requested_model
+        prompt_tokens, cached_tokens, output_tokens = token_counts(llm_response.usage_metadata)
+        cost = usage_cost(model, prompt_tokens, cached_tokens, output_tokens)
+
+        cache_saved = 0.0
+        if outcome.get("cache_hit") and outcome.get("saved_usage"):
+            saved_usage = types.GenerateContentResponseUsageMetadata.model_validate(outcome["saved_usage"])
+            cache_saved = usage_cost(outcome.get("saved_model") or model, *token_counts(saved_usage))
+
+        baseline_model = outcome.get("baseline_model")
+        routing_saved = 0.0
+        if baseline_model and baseline_model != model:
+            routing_saved = usage_cost(baseline_model, prompt_tokens, cached_tokens, output_tokens) - cost
+
+        # Specialists run in their own in-memory session; bill them to the turn's session
+        scope = _ledger_session.get()
+        if scope is None:
+            return None
+        app_name, user_id, session_id = scope
+
+        self._pending.append({
+            "app_name": app_name,
+            "user_id": user_id,
+            "session_id": session_id,
+            "invocation_id": callback_context.invocation_id,
+            "agent_name": callback_context.agent_name,
+            "model": model,
+            "prompt_tokens": prompt_tokens,
+            "cached_tokens": cached_tokens,
+            "output_tokens": output_tokens,
+            "latency_ms": (time.perf_counter() - started_at) * 1000,
+            "cost_usd": cost,
+            "cache_hit": bool(outcome.get("cache_hit")),
+            "cache_saved_usd": cache_saved,
+            "baseline_model": baseline_model,
+            "routing_saved_usd": routing_saved,
+            "retry_attempts": int(outcome.get("retry_attempts", 1)),
+            "created_at": datetime.now(),
+        })
+        return None
+
+    async def flush(self) -> int:
+        """Writes the buffered rows in one transaction off the event loop; returns how many."""
+        # A model call that raised never reaches `after_model`; forget its start time
+        now = time.perf_counter()
+        for key in [key for key, (started_at, _) in self._started.items() if now - started_at > MAX_CALL_SECONDS]:
+            del self._started[key]
+
+        records, self._pending = self._pending, []
+        if not records:
+            return 0
+        try:
+            await asyncio.to_thread(self._write, records)
+        except BaseException:
+            # Keep the rows for the next flush rather than losing them
+            self._pending[:0] = records
+            raise
+        return len(records)
+
+    def _write(self, records: List[Dict[str, Any]]) -> None:
+        with self.engine.begin() as connection:
+            connection.execute(insert(ModelUsage), records)
+
+
+# --- Reads ---
+def newest_usage_ids(
+    db_session: DBSession, app_name: str, session_keys: Iterable[Tuple[str, str]]
+) -> Dict[Tuple[str, str], int]:
+    """
+    Returns the id of the newest ledger row per (user_id, session_id), in one grouped query.
+
+    Ids only grow, so a session whose newest id changed gained usage rows,
+    even when they were flushed after the turn's events.
+    """
+    session_keys = list(session_keys)
+    if not session_keys:
+        return {}
+
+    stmt = select(ModelUsage.user_id, ModelUsage.session_id, func.max(ModelUsage.id)).where(
+        ModelUsage.app_name == app_name,
+        tuple_(ModelUsage.user_id, ModelUsage.session_id).in_(session_keys),
+    ).group_by(ModelUsage.user_id, ModelUsage.session_id)
+    return {(user_id, session_id): newest for user_id, session_id, newest in db_session.execute(stmt)}
+
+
+def fetch_session_usage(
+    db_session: DBSession, app_name: str, session_keys: Iterable[Tuple[str, str]]
+) -> Dict[Tuple[str, str], List[Dict[str, Any]]]:
+    """
+    Aggregates the ledger per session and model for the given (user_id, session_id) pairs.
+
+    Grouping happens in the database on the (app_name, user_id, session_id)
+    index, so only one small row per session and model comes back.
+    """
+    session_keys = list(session_keys)
+    if not session_keys:
+        return {}
+
+    stmt = select(
+        ModelUsage.user_id,
+        ModelUsage.session_id,
+        ModelUsage.model,
+        func.count().label("calls"),
+        func.sum(ModelUsage.prompt_tokens).label("prompt_tokens"),
+        func.sum(ModelUsage.cached_tokens).label("cached_tokens"),
+        func.sum(ModelUsage.output_tokens).label("output_tokens"),
+        func.sum(ModelUsage.cost_usd).label("cost_usd"),
+        func.sum(cast(ModelUsage.cache_hit, Integer)).label("cache_hits"),
+        func.sum(ModelUsage.cache_saved_usd).label("cache_saved_usd"),
+        func.sum(ModelUsage.routing_saved_usd).label("routing_saved_usd"),
+    ).where(
+        ModelUsage.app_name == app_name,
+        tuple_(ModelUsage.user_id, ModelUsage.session_id).in_(session_keys),
+    ).group_by(ModelUsage.user_id, ModelUsage.session_id, ModelUsage.model)
+
+    usage: Dict[Tuple[str, str], List[Dict[str, Any]]] = {}
+    for row in db_session.execute(stmt):
+        values = dict(row._mapping)
+        key = (values.pop("user_id"), values.pop("session_id"))
+        usage.setdefault(key, []).append(values)
+    return usage
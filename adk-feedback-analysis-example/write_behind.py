@@ -0,0 +1,261 @@
+import asyncio
+import logging
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy.exc import OperationalError
+from google.adk.events import Event
+from google.adk.sessions import BaseSessionService, DatabaseSessionService, Session
+from google.adk.sessions.base_session_service import GetSessionConfig, ListSessionsResponse
+from google.adk.sessions.database_session_service import (
+    StorageAppState,
+    StorageEvent,
+    StorageSession,
+    StorageUserState,
+    _extract_state_delta,
+)
+
+logger = logging.getLogger(__name__)
+
+SessionKey = Tuple[str, str, str]
+# Upper bound for the background flusher's delay while the database keeps failing
+MAX_FLUSH_BACKOFF = 5.0
+
+
+def session_key(session: Session) -> SessionKey:
+    return session.app_name, session.user_id, session.id
+
+
+class WriteBehindSessionService(DatabaseSessionService):
+    """
+    A `DatabaseSessionService` that persists events in grouped transactions.
+
+    `append_event` applies the event to the in-memory session immediately and
+    records it in an in-memory journal; the journal is written to the
+    database in one transaction every `flush_interval` seconds, whenever it
+    reaches `max_batch_events`, or when `flush()` is called (the chat loop
+    calls it at the end of every turn).
+
+    Ordering: the journal is FIFO and flushes are serialised, so events are
+    committed in exactly the order they were appended, across all sessions.
+
+    Failures: transient errors (`OperationalError`, e.g. "database is
+    locked") are retried with backoff and keep the batch in the journal. Any
+    other error is isolated to the session that caused it: the batch is
+    written again session by session, the failing session's journaled events
+    are dropped, and its error is raised to that session's next caller
+    (`append_event`, `get_session` or `flush(session)`). Other sessions'
+    events still commit, each session's in order.
+
+    Durability: an event is durable once the flush that contains it has
+    committed. Events appended since the last flush are lost if the process
+    crashes, so the window is bounded by `flush_interval` (or by the current
+    turn when flushing at turn end). Reads (`get_session`, `list_sessions`)
+    and `delete_session` flush first, so they always see every appended
+    event. The service assumes it is the only writer of the sessions it
+    journals, as is the case for the terminal chat runtime.
+    """
+
+    def __init__(
+        self,
+        db_url: str,
+        flush_interval: float = 0.05,
+        max_batch_events: int = 256,
+        max_write_attempts: int = 3,
+        retry_backoff: float = 0.1,
+        **kwargs: Any,
+    ):
+        super().__init__(db_url=db_url, **kwargs)
+        self.flush_interval = flush_interval
+        self.max_batch_events = max_batch_events
+        self.max_write_attempts = max_write_attempts
+        self.retry_backoff = retry_backoff
+        self._journal: List[Tuple[Session, Event]] = []
+        # Errors of sessions whose journaled events could not be written, until reported
+        self._failed: Dict[SessionKey, Exception] = {}
+        self._flush_lock: Optional[asyncio.Lock] = None
+        self._flush_task: Optional[asyncio.Task] = None
+
+    # --- Journal ---
+    async def append_event(self, session: Session, event: Event) -> Event:
+        if event.partial:
+            return event
+        self._raise_if_failed(session_key(session))
+
+        # Update the in-memory session right away so the running agent sees it
+        await BaseSessionService.append_event(self, session=session, event=event)
+        self._journal.append((session, event))
+
+        if len(self._journal) >= self.max_batch_events:
+            await self.flush()
+        else:
+            self._ensure_flush_task()
+        return event
+
+    async def flush(self, session: Optional[Session] = None) -> None:
+        """
+        Writes every journaled event to the database in a single transaction.
+
+        With `session`, raises the error that made that session's events fail to
+        write, if any; other sessions' write errors are left to their own callers.
+        """
+        if self._flush_lock is None:
+            self._flush_lock = asyncio.Lock()
+
+        async with self._flush_lock:
+            batch, self._journal = self._journal, []
+            update_times: Dict[SessionKey, float] = {}
+            if batch:
+                try:
+                    update_times = await self._write_with_retries(batch)
+                except OperationalError:
+                    # Put the batch back in front so ordering is kept for the retry
+                    self._journal = batch + self._journal
+                    raise
+                except Exception:
+                    update_times = await self._write_per_session(batch)
+
+        for journaled_session, _ in batch:
+            key = session_key(journaled_session)
+            if key in update_times:
+                journaled_session.last_update_time = update_times[key]
+        if session is not None:
+            self._raise_if_failed(session_key(session))
+
+    async def _write_with_retries(self, batch: List[Tuple[Session, Event]]) -> Dict[SessionKey, float]:
+        delay = self.retry_backoff
+        for attempt in range(1, self.max_write_attempts + 1):
+            try:
+                # The commit (and its fsync) runs off the event loop
+                return await asyncio.to_thread(self._write_batch, batch)
+            except OperationalError as e:
+                if attempt == self.max_write_attempts:
+                    raise
+                logger.warning(f"Write-behind flush failed (attempt {attempt}), retrying in {delay:.2f}s: {e}")
+                await asyncio.sleep(delay)
+                delay *= 2
+
+    async def _write_per_session(self, batch: List[Tuple[Session, Event]]) -> Dict[SessionKey, float]:
+        """Writes a failed batch one session at a time, so one bad session cannot block the others."""
+        by_session: Dict[SessionKey, List[Tuple[Session, Event]]] = {}
+        for entry in batch:
+            by_session.setdefault(session_key(entry[0]), []).append(entry)
+
+        update_times: Dict[SessionKey, float] = {}
+        retry_later: List[Tuple[Session, Event]] = []
+        for key, entries in by_session.items():
+            try:
+                update_times.update(await self._write_with_retries(entries))
+            except OperationalError:
+                retry_later.extend(entries)
+            except Exception as e:
+                logger.error(f"Dropping {len(entries)} unwritten event(s) of session {key[2]}: {e}")
+                self._failed[key] = e
+        self._journal = retry_later + self._journal
+        return update_times
+
+    def _raise_if_failed(self, key: SessionKey) -> None:
+        error = self._failed.pop(key, None)
+        if error is not None:
+            raise error
+
+    async def close(self) -> None:
+        """Stops the background flusher and writes any remaining events."""
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            self._flush_task = None
+        await self.flush()
+
+    def _ensure_flush_task(self) -> None:
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.get_running_loop().create_task(self._flush_periodically())
+
+    async def _flush_periodically(self) -> None:
+        delay = self.flush_interval
+        while True:
+            await asyncio.sleep(delay)
+            try:
+                await self.flush()
+                delay = self.flush_interval
+            except Exception as e:
+                # Back off while the database keeps failing instead of retrying every tick
+                delay = min(delay * 2, MAX_FLUSH_BACKOFF)
+                logger.error(f"Write-behind flush failed, retrying in {delay:.2f}s: {e}")
+
+    def _write_batch(self, batch: List[Tuple[Session, Event]]) -> Dict[SessionKey, float]:
+        """Applies the same state and event writes as `append_event`, for many events at once."""
+        with self.database_session_factory() as session_factory:
+            storage_sessions: Dict[SessionKey, StorageSession] = {}
+            app_states: Dict[str, StorageAppState] = {}
+            user_states: Dict[Tuple[str, str], StorageUserState] = {}
+
+            for session, event in batch:
+                key = session_key(session)
+                storage_session = storage_sessions.get(key)
+                if storage_session is None:
+                    storage_session = session_factory.get(StorageSession, key)
+                    if storage_session.update_time.timestamp() > session.last_update_time:
+                        raise ValueError(
+                            "The last_update_time provided in the session object"
+                            f" {datetime.fromtimestamp(session.last_update_time):'%Y-%m-%d %H:%M:%S'} is"
+                            " earlier than the update_time in the storage_session"
+                            f" {storage_session.update_time:'%Y-%m-%d %H:%M:%S'}. Please check"
+                            " if it is a stale session."
+                        )
+                    storage_sessions[key] = storage_session
+
+                if event.actions and event.actions.state_delta:
+                    app_state_delta, user_state_delta, session_state_delta = (
+                        _extract_state_delta(event.actions.state_delta)
+                    )
+                    if app_state_delta:
+                        if session.app_name not in app_states:
+                            app_states[session.app_name] = session_factory.get(StorageAppState, (session.app_name))
+                        storage_app_state = app_states[session.app_name]
+                        storage_app_state.state = {**storage_app_state.state, **app_state_delta}
+                    if user_state_delta:
+                        user_key = (session.app_name, session.user_id)
+                        if user_key not in user_states:
+                            user_states[user_key] = session_factory.get(StorageUserState, user_key)
+                        storage_user_state = user_states[user_key]
+                        storage_user_state.state = {**storage_user_state.state, **user_state_delta}
+                    if session_state_delta:
+                        storage_session.state = {**storage_session.state, **session_state_delta}
+
+                session_factory.add(StorageEvent.from_event(session, event))
+
+            session_factory.commit()
+
+            update_times = {}
+            for key, storage_session in storage_sessions.items():
+                session_factory.refresh(storage_session)
+                update_times[key] = storage_session.update_time.timestamp()
+            return update_times
+
+    # --- Reads see every appended event ---
+    async def create_session(self, **kwargs: Any) -> Session:
+        await self.flush()
+        return await super().create_session(**kwargs)
+
+    async def get_session(
+        self,
+        *,
+        app_name: str,
+        user_id: str,
+        session_id: str,
+        config: Optional[GetSessionConfig] = None,
+    ) -> Optional[Session]:
+        await self.flush()
+        self._raise_if_failed((app_name, user_id, session_id))
+        return await super().get_session(
+            app_name=app_name, user_id=user_id, session_id=session_id, config=config
+        )
+
+    async def list_sessions(self, *, app_name: str, user_id: str) -> ListSessionsResponse:
+        await self.flush()
+        return await super().list_sessions(app_name=app_name, user_id=user_id)
+
+    async def delete_session(self, app_name: str, user_id: str, session_id: str) -> None:
+        await self.flush()
+        self._failed.pop((app_name, user_id, session_id), None)
+        await super().delete_session(app_name=app_name, user_id=user_id, session_id=session_id)
@@ -5,9 +5,16 @@ from dotenv import load_dotenv
 from google.adk.runners import InMemoryRunner
 from google.genai import types
 from retry_agent.agent import root_agent
+from telemetry import configure_telemetry
+from usage_ledger import UsageLedger
 
 # Load environment variables from .env file
 load_dotenv()
+configure_telemetry("adk-retries")
+
+# Record tokens, latency, cost and the cache/route/retry outcome of every model call
+usage_ledger = UsageLedger()
+usage_ledger.attach(root_agent)
 
 async def main():
     """A minimal, non-interactive test harness for the retry agent."""
@@ -29,6 +36,8 @@ async def main():
             print(event.content.parts[0].text, end="", flush=True)
     print()
 
+    usage_ledger.print_summary()
+
 if __name__ == "__main__":
     asyncio.run(main())
 
@@ -6,9 +6,11 @@ from google import genai
 from google.genai import types
 from typing import AsyncGenerator, List
 import asyncio
+import time
 import warnings
 from .prompts import RETRY_AGENT_INSTRUCTIONS
 from dotenv import load_dotenv
+from opentelemetry import metrics, trace
 import os
 load_dotenv()
 
@@ -19,6 +21,12 @@ client = genai.Client(
     vertexai=True, project=os.getenv('GOOGLE_CLOUD_PROJECT'), location=os.getenv('GOOGLE_CLOUD_LOCATION')
 )
 
+# --- Telemetry ---
+tracer = trace.get_tracer(__name__)
+stage_duration = metrics.get_meter(__name__).create_histogram(
+    "adk.llm.stage.duration", unit="ms", description="Latency of each stage of a model call."
+)
+
 class RetryableLlm(BaseLlm):
     """A BaseLlm implementation that adds retry capabilities to any Gemini model."""
     max_retries: int = 3
@@ -27,7 +35,12 @@ class RetryableLlm(BaseLlm):
         self, request: LlmRequest, stream: bool = False
     ) -> AsyncGenerator[LlmResponse, None]:
         """Generates content from the Gemini model with retry capabilities."""
+        with tracer.start_as_current_span("RetryableLlm.generate_content") as span:
+            span.set_attribute("llm.model", self.model)
+            llm_response = await self._generate(request, span)
+        yield llm_response
 
+    async def _generate(self, request: LlmRequest, span: trace.Span) -> LlmResponse:
         contents: List[types.Content] = []
         for content in request.contents:
             parts = [types.Part(text=part.text) for part in content.parts]
@@ -35,28 +48,52 @@ class RetryableLlm(BaseLlm):
 
         # Retry loop
         for attempt in range(self.max_retries):
+            span.set_attribute("retry.attempts", attempt + 1)
+            started = time.perf_counter()
             try:
-                if attempt < self.max_retries - 1:
-                    print(f"🧪 TESTING: Artificially raising exception on attempt {attempt + 1}")
-                    raise Exception(f"Simulated failure for testing - attempt {attempt + 1}")
-                
-                response = await client.aio.models.generate_content(
-                    model=self.model,
-                    contents=contents,
-                    config=request.config
+                with tracer.start_as_current_span("retry.attempt") as attempt_span:
+                    attempt_span.set_attribute("retry.attempt", attempt + 1)
+                    if attempt < self.max_retries - 1:
+                        print(f"🧪 TESTING: Artificially raising exception on attempt {attempt + 1}")
+                        raise Exception(f"Simulated failure for testing - attempt {attempt + 1}")
+                    
+                    response = await client.aio.models.generate_content(
+                        model=self.model,
+                        contents=contents,
+                        config=request.config
+                    )
+                stage_duration.record(
+                    (time.perf_counter() - started) * 1000,
+                    {"stage": "upstream", "llm.model": self.model, "retry.attempt": attempt + 1, "outcome": "success"},
                 )
                 
                 print(f"✅ SUCCESS: Request succeeded on attempt {attempt + 1}")
                 
-                yield LlmResponse(content=response.candidates[0].content)
-                return  # Success, exit the retry loop
+                # Success, exit the retry loop
+                return LlmResponse(
+                    content=response.candidates[0].content,
+                    usage_metadata=response.usage_metadata,
+                    custom_metadata={"usage_ledger": {"model": self.model, "retry_attempts": attempt + 1}},
+                )
                 
             except Exception as e:
-                if attempt < self.max_retries:
-                    print(f"❌ Attempt {attempt + 1} failed: {e}. Retrying in 5 seconds...")
-                    await asyncio.sleep(5)
+                stage_duration.record(
+                    (time.perf_counter() - started) * 1000,
+                    {"stage": "upstream", "llm.model": self.model, "retry.attempt": attempt + 1, "outcome": "error"},
+                )
+                if attempt < self.max_retries - 1:
+                    backoff_seconds = 5
+                    print(f"❌ Attempt {attempt + 1} failed: {e}. Retrying in {backoff_seconds} seconds...")
+                    started = time.perf_counter()
+                    with tracer.start_as_current_span("retry.backoff") as backoff_span:
+                        backoff_span.set_attribute("retry.attempt", attempt + 1)
+                        backoff_span.set_attribute("retry.backoff_seconds", backoff_seconds)
+                        await asyncio.sleep(backoff_seconds)
+                    stage_duration.record((time.perf_counter() - started) * 1000, {"stage": "retry_backoff"})
                 else:
-                    print(f"💥 All {self.max_retries + 1} attempts failed. Raising last exception.")
+                    print(f"💥 All {self.max_retries} attempts failed. Raising last exception.")
+                    # Leaving the span with the exception records it and marks the call as failed
+                    span.set_attribute("retry.exhausted", True)
                     raise e
 
 root_agent = Agent(